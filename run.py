@@ -10,12 +10,23 @@ wechat-feishu-digest
   python run.py --output local     # 只写本地目录
   python run.py --output both      # 同时写飞书和本地
   python run.py --no-ai            # 跳过 AI 聚合
+  python run.py --refresh-ai       # 忽略缓存，重新生成 AI 摘要
   python run.py --dry-run          # 仅爬取预览，不写任何输出
   python run.py --config .env.prod # 指定配置文件（默认 .env）
+  python run.py --concurrency 5    # 同时爬取 5 个账号
+  python run.py --incremental      # 增量爬取：遇到已收录文章即停止翻页，周报从本地文章库汇总
+  python run.py --no-dedup         # 不合并跨账号的近似重复文章
+  python run.py --topics           # 本地按主题预聚类，AI 摘要与输出按主题组织
+  python run.py --feishu-update    # 更新本周期已有的飞书文档（只追加新文章、替换 AI 摘要）
+  python run.py --record replay    # 把搜索结果录制到 replay/ 目录
+  python run.py --backend replay   # 回放录制的结果（不联网，可用于离线测试与压测）
 """
 
 import argparse
+import json
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from pathlib import Path
 
@@ -24,8 +35,106 @@ _root = Path(getattr(sys, "_MEIPASS", str(Path(__file__).parent)))
 sys.path.insert(0, str(_root))
 
 from src.config import Config
-from src import crawler, summarizer
-from src.outputs import feishu_output, local_output
+from src import crawler, dedup, httpclient, summarizer, topics
+from src.store import ArticleStore
+from src.outputs import FeishuSink, local_output
+
+
+_print_lock = threading.Lock()
+
+# --ui-events 模式下事件行的前缀（ui.py 据此区分事件与普通日志）
+UI_EVENT_PREFIX = "\x1e"
+
+
+def _delta_printer():
+    """终端模式：AI 摘要边生成边打印"""
+    def on_delta(text: str):
+        print(text, end="", flush=True)
+    return on_delta
+
+
+def _ui_event(kind: str, **fields):
+    """--ui-events 模式：输出一行 JSON 事件，由 ui.py 转发给网页"""
+    event = json.dumps({"type": kind, **fields}, ensure_ascii=False)
+    with _print_lock:
+        print(f"{UI_EVENT_PREFIX}{event}", flush=True)
+
+
+def _ui_event_printer(kind: str):
+    """--ui-events 模式：每段增量输出为一个事件"""
+    def on_delta(text: str):
+        _ui_event(kind, delta=text)
+    return on_delta
+
+
+def _crawl_one(config, group, account: str, days: int, backend, store=None, breaker=None,
+               events: bool = False):
+    if events:
+        _ui_event("account", name=account, status="running")
+    query = config.build_query(account, group.query_template)
+    since = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+    known = store.known_keys(account) if store else ()
+    notes: list = []   # 搜索中的警告，与账号的结果行一起打印
+    # 边收边处理：入库 / 按日期筛选不必等该账号最后一页
+    stream = crawler.iter_account(
+        account, query, backend, config.search_num, group=group.name,
+        known=known, since=since, breaker=breaker, notes=notes)
+
+    if store:
+        # 增量模式：文章收到即入库，近 N 天的文章从库中汇总（旧文章也换上已解析的真实链接）
+        fetched = added = 0
+        for a in stream:
+            fetched += 1
+            added += store.upsert(account, [a])
+        url_cache = crawler.UrlCache(config.url_cache_path)
+        stored = [url_cache.apply(a) for a in store.load(account, since)]
+        recent = crawler.filter_recent(stored, days)
+        stats = f"抓取 {fetched} 条（新增 {added}）→ 库中近{days}天 {len(recent)} 条"
+    else:
+        recent_filter = crawler.RecentFilter(days)
+        for a in stream:
+            recent_filter.add(a)
+        recent = recent_filter.articles()
+        fetched = recent_filter.seen
+        stats = f"共 {fetched} 条 → 近{days}天 {len(recent)} 条"
+
+    with _print_lock:
+        print(f"  [{group.name}/{account}] {query!r} → {stats}", flush=True)
+        for note in notes:
+            print(f"    {note}", flush=True)
+    if events:
+        _ui_event("account", name=account, status="done", total=fetched,
+                  recent=len(recent))
+    return recent
+
+
+def _crawl(config, days: int, store=None, events: bool = False) -> dict:
+    """按 config.crawl_concurrency 并发爬取所有账号，结果顺序与配置顺序一致"""
+    plan = [(g, a) for g in config.groups for a in g.accounts]
+    backend = crawler.make_backend(config)
+    recording = f"，录制到 {config.record_dir}" if config.record_dir else ""
+    print(f"▶ 爬取 {len(plan)} 个账号（并发 {config.crawl_concurrency}，"
+          f"后端 {backend.name}{recording}）")
+
+    results = {}
+    breaker = crawler.CircuitBreaker(config.breaker_threshold, config.breaker_cooldown)
+    with backend, ThreadPoolExecutor(max_workers=config.crawl_concurrency) as pool:
+        futures = {pool.submit(_crawl_one, config, g, a, days, backend, store, breaker,
+                               events): a
+                   for g, a in plan}
+        for fut in as_completed(futures):
+            account = futures[fut]
+            try:
+                results[account] = fut.result()
+            except Exception as e:
+                with _print_lock:
+                    print(f"  ⚠ 爬取失败 [{account}]: {e}", flush=True)
+                if events:
+                    _ui_event("account", name=account, status="failed")
+                results[account] = []
+
+    # 按配置顺序重建，保证输出稳定
+    return {a: results[a] for _, a in plan}
 
 
 def main():
@@ -38,14 +147,48 @@ def main():
     parser.add_argument("--output",  choices=["feishu", "local", "both", "auto"], default="auto",
                         help="输出目标：feishu / local / both / auto（默认 auto，根据配置自动选）")
     parser.add_argument("--no-ai",   action="store_true",      help="跳过 AI 聚合摘要")
+    parser.add_argument("--refresh-ai", action="store_true", help="忽略 AI 摘要缓存，重新生成")
     parser.add_argument("--dry-run", action="store_true",      help="仅爬取预览，不写任何输出")
     parser.add_argument("--config",  default=".env",           help="配置文件路径（默认 .env）")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="同时爬取的账号数（覆盖 .env 中的 CRAWL_CONCURRENCY）")
+    parser.add_argument("--incremental", action="store_true",
+                        help="增量爬取：遇到已收录文章即停止翻页，周报从本地文章库汇总")
+    parser.add_argument("--ui-events", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--no-dedup", action="store_true",
+                        help="不合并跨账号的近似重复文章")
+    parser.add_argument("--topics", action="store_true",
+                        help="本地按主题预聚类，AI 摘要与输出按主题组织（覆盖 .env 中的 TOPICS）")
+    parser.add_argument("--feishu-update", action="store_true",
+                        help="更新本周期已有的飞书文档，而不是新建（覆盖 .env 中的 FEISHU_UPDATE）")
+    parser.add_argument("--backend", choices=["worker", "subprocess", "replay"], default=None,
+                        help="搜索后端（覆盖 .env 中的 SEARCH_BACKEND）")
+    parser.add_argument("--record",  metavar="DIR", default=None,
+                        help="把搜索结果录制到 DIR，供 --backend replay 回放")
+    parser.add_argument("--replay-dir", metavar="DIR", default=None,
+                        help="replay 后端读取的录制目录（覆盖 .env 中的 REPLAY_DIR）")
     args = parser.parse_args()
 
     # ── 加载配置 ────────────────────────────────────────────────────────────
     config = Config(args.config)
     if args.days:
         config.search_days = args.days
+    if args.concurrency:
+        config.crawl_concurrency = max(1, args.concurrency)
+    if args.incremental:
+        config.incremental = True
+    if args.no_dedup:
+        config.dedup = False
+    if args.topics:
+        config.topics = True
+    if args.feishu_update:
+        config.feishu_update = True
+    if args.backend:
+        config.search_backend = args.backend
+    if args.record:
+        config.record_dir = Path(args.record)
+    if args.replay_dir:
+        config.replay_dir = Path(args.replay_dir)
 
     days  = config.search_days
     now   = datetime.now()
@@ -60,27 +203,45 @@ def main():
     print(f"  账号: {', '.join(config.accounts)}")
     print(f"{'='*60}\n")
 
-    # ── 爬取（按分组） ───────────────────────────────────────────────────────
-    articles_by_account = {}
-    for group in config.groups:
-        if not group.accounts:
-            continue
-        print(f"\n▶ {group.name}")
-        for account in group.accounts:
-            query = config.build_query(account, group.query_template)
-            print(f"  [{account}] {query!r} ...", end=" ", flush=True)
-            all_arts = crawler.search(
-                account, query, config.search_script_path, config.search_num,
-                group=group.name)
-            recent = crawler.filter_recent(all_arts, days)
-            articles_by_account[account] = recent
-            print(f"共 {len(all_arts)} 条 → 近{days}天 {len(recent)} 条")
+    # ── 确定输出目标 ─────────────────────────────────────────────────────────
+    output_mode = args.output
+    if output_mode == "auto":
+        targets = []
+        if config.feishu_enabled:
+            targets.append("feishu")
+        targets.append("local")   # 本地总是作为 fallback
+        output_mode = "both" if "feishu" in targets else "local"
+
+    # 飞书文档在爬取期间就在后台创建，文章列表在 AI 摘要生成期间写入
+    feishu_sink = None
+    if output_mode in ("feishu", "both") and config.feishu_enabled and not args.dry_run:
+        feishu_sink = FeishuSink(config, title, update=config.feishu_update)
+
+    # ── 爬取（按分组，账号间并发） ─────────────────────────────────────────────
+    store = ArticleStore(config.article_store_path) if config.incremental else None
+    try:
+        articles_by_account = _crawl(config, days, store, events=args.ui_events)
+    except BaseException:
+        if feishu_sink:
+            feishu_sink.discard()
+        raise
+    finally:
+        if store:
+            store.close()
 
     total = sum(len(v) for v in articles_by_account.values())
+    if config.dedup and total:
+        articles_by_account = dedup.collapse(articles_by_account, config.dedup_threshold)
+        merged = total - sum(len(v) for v in articles_by_account.values())
+        total -= merged
+        if merged:
+            print(f"\n去重: 合并 {merged} 篇近似重复文章")
     print(f"\n合计: {total} 篇\n")
 
     if total == 0:
         print("⚠ 未获取到任何文章，退出")
+        if feishu_sink:
+            feishu_sink.discard()
         return
 
     # ── dry-run 预览 ────────────────────────────────────────────────────────
@@ -91,28 +252,48 @@ def main():
                 print(f"  [{a.date}] {a.title[:70]}")
         return
 
+    # ── 主题预聚类 ──────────────────────────────────────────────────────────
+    topic_list = None
+    if config.topics:
+        topic_list = topics.cluster(articles_by_account, config.topic_threshold)
+        clustered = [t for t in topic_list if t.label != topics.OTHER_TOPIC]
+        print(f"主题聚类: {len(clustered)} 个主题，"
+              f"覆盖 {sum(len(t.articles) for t in clustered)}/{total} 篇")
+
+    if feishu_sink:
+        feishu_sink.write_articles(articles_by_account, date_range, topic_list)
+
     # ── AI 聚合摘要 ─────────────────────────────────────────────────────────
     ai_summary = None
     if not args.no_ai and config.ai_enabled:
-        print("AI 聚合摘要中...", end=" ", flush=True)
+        print("AI 聚合摘要中...", flush=True)
+        on_delta = _ui_event_printer("ai") if args.ui_events else _delta_printer()
+        cache = (summarizer.SummaryCache(config.ai_cache_dir,
+                                         ttl=config.ai_cache_ttl_hours * 3600,
+                                         max_bytes=int(config.ai_cache_max_mb * (1 << 20)))
+                 if config.ai_cache else None)
         ai_summary = summarizer.summarize(
             articles_by_account,
             api_key=config.openrouter_api_key,
             model=config.openrouter_model,
+            fallbacks=config.openrouter_models[1:],
+            hedge_delay=config.ai_hedge_delay,
+            cache=cache,
+            refresh=args.refresh_ai,
+            prompt_tokens=config.ai_prompt_tokens,
+            max_chunks=config.ai_max_chunks,
+            concurrency=config.ai_concurrency,
+            timeout=config.ai_timeout,
+            stall_timeout=config.ai_stall_timeout,
+            on_delta=on_delta,
+            topics=topic_list,
         )
-        print("✓" if ai_summary else "跳过（失败）")
+        if not args.ui_events:
+            print()  # 结束流式输出的最后一行
+        print("AI 聚合摘要 ✓" if ai_summary else "AI 聚合摘要跳过（失败）")
     elif not config.ai_enabled and not args.no_ai:
         print("ℹ AI 聚合已跳过（未配置 OPENROUTER_API_KEY）")
 
-    # ── 确定输出目标 ─────────────────────────────────────────────────────────
-    output_mode = args.output
-    if output_mode == "auto":
-        targets = []
-        if config.feishu_enabled:
-            targets.append("feishu")
-        targets.append("local")   # 本地总是作为 fallback
-        output_mode = "both" if "feishu" in targets else "local"
-
     print(f"\n输出目标: {output_mode}")
 
     kwargs = dict(
@@ -121,14 +302,15 @@ def main():
         title=title,
         date_range=date_range,
         config=config,
+        topics=topic_list,
     )
 
     # ── 输出 ────────────────────────────────────────────────────────────────
     if output_mode in ("feishu", "both"):
-        if config.feishu_enabled:
+        if feishu_sink:
             print("\n→ 写入飞书文档...")
             try:
-                url = feishu_output(**kwargs)
+                url = feishu_sink.finish(ai_summary)
                 print(f"  ✅ 飞书文档: {url}")
             except Exception as e:
                 print(f"  ❌ 飞书写入失败: {e}")
@@ -143,6 +325,10 @@ def main():
         except Exception as e:
             print(f"  ❌ 本地写入失败: {e}")
 
+    http_stats = httpclient.default_client().summary()
+    if http_stats:
+        print(f"\nHTTP: {http_stats}")
+
     print(f"\n{'='*60}")
     print(f"  完成！合计 {total} 篇")
     print(f"{'='*60}\n")
@@ -0,0 +1,161 @@
+"""按日期分区的只追加归档：每次运行一个 gzip NDJSON 分段
+
+目录结构：<root>/YYYY-MM-DD/HHMMSS-<pid>.ndjson.gz，同一天多次运行各写一个分段，
+互不覆盖。分段边写边压缩到临时文件，写完才原子改名为正式文件名，
+中途失败不会留下半截分段；写入时一次只序列化一条记录。
+
+每行一条记录，按以下顺序：
+  {"type": "run", "title", "date_range", "generated_at", "total"}
+  {"type": "summary", "text"}                      # 有 AI 摘要时
+  {"type": "article", "account", <Article.to_dict()>}  # 同一账号的文章连续出现
+  {"type": "account", "account"}                   # 没有文章的账号
+  {"type": "topic", "label", "articles": [文章唯一键, …]}
+
+本地输出的 {date}_raw.json 由分段导出（见 write_raw_json），可随时从归档重新生成。
+"""
+import gzip
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from .crawler import Article
+from .store import article_key
+from .topics import Topic
+
+_SUFFIX = ".ndjson.gz"
+
+
+class ArchiveWriter:
+    """一次运行的归档分段：write() 逐条追加，commit() 原子改名生效，abort() 丢弃
+
+    也可作上下文管理器使用：正常退出时 commit，出错时 abort。
+    """
+
+    def __init__(self, root: Path, when: Optional[datetime] = None):
+        when = when or datetime.now()
+        part = root / when.strftime("%Y-%m-%d")
+        part.mkdir(parents=True, exist_ok=True)
+        stem = f"{when.strftime('%H%M%S')}-{os.getpid()}"
+        self.path = part / f"{stem}{_SUFFIX}"
+        n = 1
+        while self.path.exists():  # 同一秒内再次写入：加序号，不覆盖已有分段
+            self.path = part / f"{stem}-{n}{_SUFFIX}"
+            n += 1
+        self._tmp = self.path.with_name(f".{self.path.name}.tmp")
+        self._file = gzip.open(self._tmp, "wt", encoding="utf-8")
+        self.count = 0
+
+    def write(self, record: dict):
+        self._file.write(json.dumps(record, ensure_ascii=False))
+        self._file.write("\n")
+        self.count += 1
+
+    def commit(self) -> Path:
+        self._file.close()
+        os.replace(self._tmp, self.path)
+        return self.path
+
+    def abort(self):
+        self._file.close()
+        try:
+            self._tmp.unlink()
+        except OSError:
+            pass
+
+    def __enter__(self) -> "ArchiveWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+
+
+def write_run(
+    root: Path,
+    articles_by_account: Dict[str, List[Article]],
+    ai_summary: Optional[str],
+    title: str,
+    date_range: str,
+    topics: Optional[List[Topic]] = None,
+) -> Path:
+    """把一次运行的结果写成新的归档分段，返回分段路径"""
+    with ArchiveWriter(root) as w:
+        w.write({
+            "type": "run",
+            "title": title,
+            "date_range": date_range,
+            "generated_at": datetime.now().isoformat(),
+            "total": sum(len(v) for v in articles_by_account.values()),
+        })
+        if ai_summary is not None:
+            w.write({"type": "summary", "text": ai_summary})
+        for account, articles in articles_by_account.items():
+            if not articles:
+                w.write({"type": "account", "account": account})
+            for a in articles:
+                w.write({"type": "article", "account": account, **a.to_dict()})
+        for t in topics or []:
+            w.write({"type": "topic", "label": t.label,
+                     "articles": [article_key(a.title, a.source) for a in t.articles]})
+    return w.path
+
+
+def segments(root: Path, since: str = "", until: str = "") -> List[Path]:
+    """[since, until] 日期范围（YYYY-MM-DD，空表示不限）内的所有分段，按时间先后"""
+    if not root.is_dir():
+        return []
+    parts = sorted(p for p in root.iterdir() if p.is_dir()
+                   and (not since or p.name >= since) and (not until or p.name <= until))
+    return [seg for p in parts for seg in sorted(p.glob(f"*{_SUFFIX}"))]
+
+
+def read(path: Path) -> Iterator[dict]:
+    """逐条读出一个分段的记录"""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _indented(obj, level: int) -> str:
+    return json.dumps(obj, ensure_ascii=False, indent=2).replace("\n", "\n" + " " * level)
+
+
+def write_raw_json(segment: Path, path: Path):
+    """由归档分段导出 raw.json（格式同以往整体 json.dump 的结果），逐条流式写出后原子改名"""
+    tmp = path.with_name(f".{path.name}.tmp")
+    try:
+        with open(tmp, "w", encoding="utf-8") as out:
+            account = None
+            for rec in read(segment):
+                kind = rec.pop("type")
+                if kind == "run":
+                    meta = {k: rec[k] for k in ("title", "date_range", "generated_at", "total")}
+                    out.write('{\n  "meta": ' + _indented(meta, 2) + ",\n  \"ai_summary\": ")
+                    summary = None
+                elif kind == "summary":
+                    summary = rec["text"]
+                elif kind in ("article", "account"):
+                    if account is None:
+                        out.write(json.dumps(summary, ensure_ascii=False) + ',\n  "articles": {')
+                    name = rec.pop("account")
+                    if name != account:
+                        if account is not None:
+                            out.write("\n    ]," if wrote else "],")
+                        out.write("\n    " + json.dumps(name, ensure_ascii=False) + ": [")
+                        account, wrote = name, False
+                    if kind == "article":
+                        out.write(("," if wrote else "") + "\n      " + _indented(rec, 6))
+                        wrote = True
+            if account is None:
+                out.write(json.dumps(summary, ensure_ascii=False) + ',\n  "articles": {}\n}')
+            else:
+                out.write("\n    ]\n  }\n}" if wrote else "]\n  }\n}")
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
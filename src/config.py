@@ -4,6 +4,25 @@ from datetime import datetime
 from pathlib import Path
 
 
+# 常见模型的上下文长度（token，按模型名前缀匹配），用于推算 prompt 预算；未列出的按默认值
+MODEL_CONTEXT_TOKENS = [
+    ("google/gemini",      1000000),
+    ("anthropic/claude",   200000),
+    ("openai/gpt-4.1",     1000000),
+    ("openai/gpt-4o",      128000),
+    ("openai/gpt-5",       400000),
+    ("deepseek/",          64000),
+    ("qwen/",              32000),
+    ("moonshotai/",        128000),
+    ("meta-llama/",        128000),
+    ("stepfun/",           64000),
+]
+DEFAULT_CONTEXT_TOKENS = 32000
+# 周报 prompt 的默认上限（token）：约 70 篇带摘要的文章，再多就分段提炼（map-reduce）。
+# 长上下文模型一次塞进几百篇，摘要质量反而下降，也失去分段并发的速度优势
+DEFAULT_PROMPT_TOKENS = 8000
+
+
 def _parse_env_file(path: Path) -> dict:
     result = {}
     if not path.exists():
@@ -22,6 +41,10 @@ def _split_list(s: str) -> list:
     return [x.strip() for x in s.split(",") if x.strip()]
 
 
+def _as_bool(s: str) -> bool:
+    return str(s).strip().lower() in ("1", "true", "yes", "on")
+
+
 class AccountGroup:
     """一组账号及其专属搜索模板"""
     def __init__(self, name: str, accounts: list, query_template: str):
@@ -46,17 +69,61 @@ class Config:
         self.feishu_app_id       = get("FEISHU_APP_ID", "")
         self.feishu_app_secret   = get("FEISHU_APP_SECRET", "")
         self.feishu_share_openid = get("FEISHU_SHARE_OPENID", "")
+        # 更新模式：同一周期（day / week / month）内重跑时更新同一篇文档，链接不变
+        self.feishu_update       = _as_bool(get("FEISHU_UPDATE", "0"))
+        self.feishu_doc_period   = get("FEISHU_DOC_PERIOD", "week").strip().lower()
 
         # ── OpenRouter AI 配置（可选）───────────────────────────
         self.openrouter_api_key = get("OPENROUTER_API_KEY", "")
-        self.openrouter_model   = get("OPENROUTER_MODEL", "stepfun/step-3.5-flash:free")
+        # 可填多个模型（逗号分隔）：按顺序降级，前一个失败时改用下一个
+        self.openrouter_models  = [m.strip() for m in get(
+            "OPENROUTER_MODEL", "stepfun/step-3.5-flash:free").split(",") if m.strip()]
+        self.openrouter_model   = (self.openrouter_models or ["stepfun/step-3.5-flash:free"])[0]
+        # 对冲：首选模型 AI_HEDGE_DELAY 秒内还没开始输出就同时请求下一个，先出结果的胜出（0 = 关闭）
+        self.ai_hedge_delay     = float(get("AI_HEDGE_DELAY", "0"))
+        # 相同输入的摘要直接复用缓存（CACHE_DIR/ai_summaries），有效期按小时、总大小按 MB 计
+        self.ai_cache           = _as_bool(get("AI_CACHE", "1"))
+        self.ai_cache_ttl_hours = float(get("AI_CACHE_TTL_HOURS", "168"))
+        self.ai_cache_max_mb    = float(get("AI_CACHE_MAX_MB", "20"))
+        # 单次请求的 prompt 预算上限（token，0 = 只按模型上下文长度推算，见 ai_prompt_tokens）；
+        # 文章超出一个请求的预算时按板块分段并发提炼（map-reduce），最多 AI_MAX_CHUNKS 段，
+        # 同时在途的请求数与单个请求的超时（秒）
+        self._ai_prompt_tokens = int(get("AI_PROMPT_TOKENS", str(DEFAULT_PROMPT_TOKENS)) or 0)
+        self.ai_max_chunks  = max(1, int(get("AI_MAX_CHUNKS", "8")))
+        self.ai_concurrency = max(1, int(get("AI_CONCURRENCY", "4")))
+        self.ai_timeout     = float(get("AI_TIMEOUT", "60"))
+        # 流式响应超过 AI_STALL_TIMEOUT 秒没有新内容即视为卡住，提前重试
+        self.ai_stall_timeout = float(get("AI_STALL_TIMEOUT", "15"))
 
         # ── 本地输出（可选）────────────────────────────────────
         self.local_output_dir = Path(get("LOCAL_OUTPUT_DIR", "./output"))
 
+        # 跨运行复用的缓存（搜狗 cookie 等）
+        self.cache_dir = Path(get("CACHE_DIR", "./.cache"))
+
         # ── 爬取配置────────────────────────────────────────────
         self.search_days = int(get("SEARCH_DAYS", "7"))
         self.search_num  = int(get("SEARCH_NUM", "30"))
+        # 并发爬取的账号数（1 = 串行）
+        self.crawl_concurrency = max(1, int(get("CRAWL_CONCURRENCY", "3")))
+        # 把搜狗跳转链接解析为 mp.weixin.qq.com 真实链接（每篇额外请求一次）
+        self.resolve_urls        = _as_bool(get("RESOLVE_URLS", "0"))
+        self.resolve_concurrency = max(1, int(get("RESOLVE_CONCURRENCY", "4")))
+        # 全局搜索页请求速率（次/秒，所有 Node 进程共用一个令牌桶，见 crawler.Pacer）与反爬熔断
+        self.crawl_rate        = float(get("CRAWL_RATE", "2"))
+        self.breaker_threshold = int(get("BREAKER_THRESHOLD", "2"))
+        self.breaker_cooldown  = float(get("BREAKER_COOLDOWN", "60"))
+        # Node 脚本到每个主机的 keep-alive 连接上限
+        self.search_max_sockets  = max(1, int(get("SEARCH_MAX_SOCKETS", "8")))
+        # 增量爬取：文章入库（LOCAL_OUTPUT_DIR/articles.db），遇到已收录文章即停止翻页
+        self.incremental = _as_bool(get("INCREMENTAL", "0"))
+        # 跨账号合并近似重复文章（标题 + 摘要相似度不低于阈值即视为同一事件）
+        self.dedup           = _as_bool(get("DEDUP", "1"))
+        self.dedup_threshold = float(get("DEDUP_THRESHOLD", "0.5"))
+        # 本地主题预聚类：AI 摘要按主题组织输入，输出中增加「按主题」部分
+        # （与主题中心的相似度不低于 TOPIC_THRESHOLD 即归入该主题；装了 NumPy 会更快）
+        self.topics          = _as_bool(get("TOPICS", "0"))
+        self.topic_threshold = float(get("TOPIC_THRESHOLD", "0.1"))
 
         # 默认账号 & 搜索模板（{account} {year} {month} 会被自动替换）
         default_accounts = get("ACCOUNTS", "机器之心,新智元,量子位")
@@ -95,6 +162,15 @@ class Config:
         default_script = str(_assets_dir() / "wechat_search" / "scripts" / "search_wechat.js")
         self.search_script_path = get("SEARCH_SCRIPT_PATH", default_script)
 
+        # 搜索后端：worker 复用常驻 Node 进程（省去每个账号的启动与 cookie 握手）/
+        # subprocess 每个账号单独启动 node / replay 回放 REPLAY_DIR 中录制的结果（不联网）
+        legacy = "worker" if _as_bool(get("SEARCH_WORKER", "1")) else "subprocess"
+        self.search_backend = get("SEARCH_BACKEND", legacy).strip().lower()
+        self.replay_dir = Path(get("REPLAY_DIR", "./replay"))
+        # 非空时把每个账号的搜索结果录制到该目录，供 replay 后端回放
+        record_dir = get("RECORD_DIR", "")
+        self.record_dir = Path(record_dir) if record_dir else None
+
     def build_query(self, account: str, template: str) -> str:
         """把模板里的 {account} {year} {month} 替换为实际值"""
         return (template
@@ -116,3 +192,47 @@ class Config:
     @property
     def ai_enabled(self) -> bool:
         return bool(self.openrouter_api_key)
+
+    @property
+    def ai_prompt_tokens(self) -> int:
+        """单次请求的 prompt 预算：AI_PROMPT_TOKENS（默认 DEFAULT_PROMPT_TOKENS），
+        且不超过模型上下文扣除输出后的八成；AI_PROMPT_TOKENS=0 时只按后者
+
+        配置了多个模型时按上下文最短的一个计算，保证降级后的请求也放得下。
+        """
+        context = min(
+            next((n for prefix, n in MODEL_CONTEXT_TOKENS if model.lower().startswith(prefix)),
+                 DEFAULT_CONTEXT_TOKENS)
+            for model in self.openrouter_models or [self.openrouter_model])
+        limit = int((context - 1500) * 0.8)
+        if self._ai_prompt_tokens > 0:
+            return min(self._ai_prompt_tokens, limit)
+        return limit
+
+    @property
+    def article_store_path(self) -> Path:
+        return self.local_output_dir / "articles.db"
+
+    @property
+    def archive_dir(self) -> Path:
+        return self.local_output_dir / "archive"
+
+    @property
+    def cookie_cache_path(self) -> Path:
+        return self.cache_dir / "sogou_cookies.json"
+
+    @property
+    def url_cache_path(self) -> Path:
+        return self.cache_dir / "resolved_urls.json"
+
+    @property
+    def feishu_token_path(self) -> Path:
+        return self.cache_dir / "feishu_tokens.json"
+
+    @property
+    def feishu_doc_map_path(self) -> Path:
+        return self.cache_dir / "feishu_docs.json"
+
+    @property
+    def ai_cache_dir(self) -> Path:
+        return self.cache_dir / "ai_summaries"
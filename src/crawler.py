@@ -1,24 +1,60 @@
 """微信文章爬取：调用 Node.js 搜索脚本"""
 import json
 import os
+import queue
+import random
+import re
 import subprocess
-from dataclasses import dataclass, field
+import threading
+import time
+from array import array
+from collections import deque
 from datetime import datetime, timedelta
-from typing import List, Optional
+from operator import attrgetter
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+
+def _parse_ts(value: str) -> float:
+    """"YYYY-MM-DD[ HH:MM:SS]" → 本地时间戳；空串或无法解析时为 0"""
+    if not value:
+        return 0.0
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        return 0.0
 
 
-@dataclass
 class Article:
-    title:    str
-    url:      str
-    summary:  str
-    datetime: str      # "YYYY-MM-DD HH:MM:SS"
-    source:   str
-    group:    str = "" # 所属账号组名称（科技媒体 / 投资资讯 / …）
+    """一篇文章。datetime 为 "YYYY-MM-DD HH:MM:SS" 字符串，赋值时同时解析出时间戳 ts，
+    筛选、排序直接比较 ts。用 __slots__ 省内存：回溯历史时一次会载入数万篇。
+    """
+
+    __slots__ = ("title", "url", "summary", "source", "group", "related", "_datetime", "ts")
+    _FIELDS = ("title", "url", "summary", "datetime", "source", "group", "related")
+
+    def __init__(self, title: str, url: str, summary: str, datetime: str, source: str,
+                 group: str = "", related: Optional[List[str]] = None):
+        self.title   = title
+        self.url     = url
+        self.summary = summary
+        self.source  = source
+        self.group   = group    # 所属账号组名称（科技媒体 / 投资资讯 / …）
+        self.related = related if related is not None else []  # 近似重复文章的其他来源（见 dedup）
+        self.datetime = datetime
+
+    @property
+    def datetime(self) -> str:
+        return self._datetime
+
+    @datetime.setter
+    def datetime(self, value: str):
+        self._datetime = value
+        self.ts = _parse_ts(value)
 
     @property
     def date(self) -> str:
-        return self.datetime[:10] if self.datetime else ""
+        return self._datetime[:10]
 
     def to_dict(self) -> dict:
         return {
@@ -28,68 +64,795 @@ class Article:
             "datetime": self.datetime,
             "source":   self.source,
             "group":    self.group,
+            "related":  self.related,
         }
 
+    def __eq__(self, other) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return all(getattr(self, f) == getattr(other, f) for f in self._FIELDS)
+
+    def __repr__(self) -> str:
+        args = ", ".join(f"{f}={getattr(self, f)!r}" for f in self._FIELDS)
+        return f"Article({args})"
+
+
+def _day_start(days: int) -> float:
+    """days 天前那一天 0 点的时间戳（与按日期字符串比较的口径一致）"""
+    day = (datetime.now() - timedelta(days=days)).date()
+    return datetime(day.year, day.month, day.day).timestamp()
+
+
+class ArticleBatch:
+    """文章的列式容器：时间戳单独存成 array('d')，按列筛选、排序、分组
+
+    每个操作返回新的 ArticleBatch（共享 Article 对象），可链式调用：
+        ArticleBatch(arts).recent(7).latest_by_title().sorted()
+    """
+
+    __slots__ = ("articles", "ts")
+
+    def __init__(self, articles: Iterable[Article] = ()):
+        self.articles: List[Article] = list(articles)
+        self.ts = array("d", [a.ts for a in self.articles])
+
+    def __len__(self) -> int:
+        return len(self.articles)
+
+    def __iter__(self) -> Iterator[Article]:
+        return iter(self.articles)
+
+    def __getitem__(self, i: int) -> Article:
+        return self.articles[i]
+
+    def select(self, idx: Iterable[int]) -> "ArticleBatch":
+        """按下标取子集（保持给定顺序）"""
+        idx = list(idx)
+        batch = ArticleBatch.__new__(ArticleBatch)
+        batch.articles = [self.articles[i] for i in idx]
+        batch.ts = array("d", [self.ts[i] for i in idx])
+        return batch
+
+    def since(self, cutoff: float) -> "ArticleBatch":
+        """发布时间不早于 cutoff（时间戳）的文章；没有日期的文章一并剔除"""
+        ts = self.ts
+        return self.select([i for i in range(len(ts)) if ts[i] >= cutoff and ts[i] > 0])
+
+    def recent(self, days: int) -> "ArticleBatch":
+        """最近 days 天（按自然日，含 days 天前当天）的文章"""
+        return self.since(_day_start(days))
+
+    def sorted(self, reverse: bool = True) -> "ArticleBatch":
+        """按发布时间排序，默认最新在前；没有日期的排在最后"""
+        ts = self.ts
+        return self.select(sorted(range(len(ts)), key=ts.__getitem__, reverse=reverse))
+
+    def latest_by_title(self) -> "ArticleBatch":
+        """同标题只保留时间最新的一条（保持首次出现的位置）"""
+        ts = self.ts
+        pos: Dict[str, int] = {}
+        for i, a in enumerate(self.articles):
+            key = a.title.strip()
+            j = pos.get(key)
+            if j is None or ts[i] > ts[j]:
+                pos[key] = i
+        return self.select(pos.values())
+
+    def group_by(self, key: str = "source") -> Dict[str, "ArticleBatch"]:
+        """按 source / group 等属性分组，组内保持原顺序"""
+        idx: Dict[str, List[int]] = {}
+        for i, a in enumerate(self.articles):
+            idx.setdefault(getattr(a, key), []).append(i)
+        return {k: self.select(v) for k, v in idx.items()}
+
+    def to_list(self) -> List[Article]:
+        return list(self.articles)
+
+
+def _parse_article(item: dict, group: str = "") -> Article:
+    return Article(
+        title    = item.get("title", "").strip(),
+        url      = item.get("url", "").strip(),
+        summary  = item.get("summary", "").replace("\n", " ").strip(),
+        datetime = item.get("datetime", ""),
+        source   = item.get("source", ""),
+        group    = group,
+    )
+
+
+class AntispiderError(RuntimeError):
+    """搜索被搜狗反爬拦截（重试后仍失败）"""
+
+
+class RateLimitedError(RuntimeError):
+    """搜狗持续返回 429（重试后仍被限流）：只是请求太快，不计入反爬熔断"""
+
+
+class Pacer:
+    """全局自适应限速：所有 worker / 子进程请求搜索页前都从这里取令牌
+
+    令牌桶容量为 1（只匀速、不突发），间隔带 ±20% 抖动。任一进程报告被限流
+    （429 或反爬页）即全局速率减半（最低为 rate/16）并暂停一段指数退避时间，
+    所有进程一起放慢；之后每次成功逐步恢复。线程安全。
+    """
+
+    MIN_BACKOFF = 5.0
+    MAX_BACKOFF = 60.0
+
+    def __init__(self, rate: float = 1.0):
+        self.max_rate = rate if rate > 0 else 1.0
+        self.rate = self.max_rate
+        self._lock = threading.Lock()
+        self._next = 0.0            # 下一个令牌的发放时刻（monotonic）
+        self._paused_until = 0.0
+        self._backoff = self.MIN_BACKOFF
+
+    def acquire(self) -> float:
+        """阻塞到拿到令牌，返回等待的秒数"""
+        started = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now >= self._paused_until:
+                    slot = max(now, self._next)
+                    self._next = slot + random.uniform(0.8, 1.2) / self.rate
+                    wait = slot - now
+                else:
+                    wait = -1.0
+                    pause = self._paused_until - now
+            if wait < 0:
+                time.sleep(pause)
+                continue
+            if wait > 0:
+                time.sleep(wait)
+            return time.monotonic() - started
+
+    def penalize(self):
+        """被限流/拦截：速率减半，全局暂停一段退避时间"""
+        with self._lock:
+            self.rate = max(self.max_rate / 16, self.rate / 2)
+            self._paused_until = time.monotonic() + self._backoff
+            self._next = self._paused_until
+            msg = f"  ⏸ 搜索页被限流：全局速率降至 {self.rate:.2f}/s，暂停 {self._backoff:.0f}s"
+            self._backoff = min(self._backoff * 2, self.MAX_BACKOFF)
+        print(msg, flush=True)
+
+    def reward(self):
+        """请求成功：逐步恢复速率"""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 8)
+            self._backoff = self.MIN_BACKOFF
+
+
+def _answer_pace(msg: dict, pacer: Pacer, stdin) -> float:
+    """处理 node 的限速消息（见 search_wechat.js 的 StdinPacer），返回为取令牌等待的秒数"""
+    kind = msg.get("pace")
+    if kind == "ok":
+        pacer.reward()
+    elif kind == "throttled":
+        pacer.penalize()
+    elif kind == "acquire":
+        waited = pacer.acquire()
+        try:
+            stdin.write('{"pace": "go"}\n')
+            stdin.flush()
+        except (BrokenPipeError, OSError, ValueError):
+            pass  # 进程已退出，由读取方报错
+        return waited
+    return 0.0
+
+
+class CircuitBreaker:
+    """跨账号共享的反爬熔断器
+
+    连续 threshold 个账号被拦截即熔断：后续账号先暂停 cooldown 秒再继续；
+    熔断累计 max_trips 次后放弃剩余账号，避免继续撞墙、白白耗尽超时。
+    """
+
+    def __init__(self, threshold: int = 2, cooldown: float = 60, max_trips: int = 2):
+        self.threshold = max(1, threshold)
+        self.cooldown = cooldown
+        self.max_trips = max(1, max_trips)
+        self._lock = threading.Lock()
+        self._consecutive = 0
+        self._trips = 0
+        self._opened_at: Optional[float] = None
+
+    def allow(self) -> bool:
+        """账号开始爬取前调用：熔断中则等待冷却；已放弃时返回 False"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trips >= self.max_trips:
+                return False
+            wait = self._opened_at + self.cooldown - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+    def record(self, blocked: bool):
+        with self._lock:
+            if self._trips >= self.max_trips:
+                return  # 已放弃，在途账号的结果不再影响状态
+            if not blocked:
+                self._consecutive = 0
+                self._opened_at = None
+                return
+            self._consecutive += 1
+            if self._consecutive < self.threshold:
+                return
+            self._consecutive = 0
+            self._trips += 1
+            self._opened_at = time.monotonic()
+            if self._trips >= self.max_trips:
+                print("  ⛔ 搜狗反爬持续拦截，放弃剩余账号", flush=True)
+            else:
+                print(f"  ⛔ 连续 {self.threshold} 个账号触发反爬，暂停 {self.cooldown:.0f}s", flush=True)
+
+
+def url_cache_key(title: str, source: str) -> str:
+    """规范化的 标题+来源 键，与 search_wechat.js 的 urlCacheKey 一致"""
+    return re.sub(r"\s+", "", title).lower() + "\t" + source.strip()
+
+
+class UrlCache:
+    """已解析真实链接的磁盘缓存（search_wechat.js --url-cache 写入，这里只读）"""
+
+    def __init__(self, path):
+        self.links: dict = {}
+        self.titles: dict = {}
+        try:
+            data = json.loads(Path(path).read_text(encoding="utf-8"))
+            self.links = data.get("links", {})
+            self.titles = data.get("titles", {})
+        except (OSError, ValueError):
+            pass
+
+    def lookup(self, url: str, title: str, source: str) -> str:
+        """搜狗跳转链接命中缓存时返回真实链接，否则原样返回"""
+        if "weixin.sogou.com" not in url:
+            return url
+        return (self.links.get(url)
+                or self.titles.get(url_cache_key(title, source))
+                or url)
+
+    def apply(self, article: Article) -> Article:
+        """搜狗跳转链接命中缓存时原地替换为真实链接"""
+        article.url = self.lookup(article.url, article.title, article.source)
+        return article
+
+
+class SearchWorker:
+    """常驻的 `node search_wechat.js --worker` 进程，按 NDJSON 收发请求
+
+    搜索页请求由 pacer 统一放行（--pace-stdin），与其他 worker 共享限速与退避状态。
+    """
+
+    def __init__(self, script_path: str, cookie_cache: str = "", max_sockets: int = 0,
+                 url_cache: str = "", pacer: Optional[Pacer] = None):
+        self.pacer = pacer or Pacer()
+        self.proc = subprocess.Popen(
+            ["node", script_path, "--worker", "--pace-stdin"]
+            + _node_args(cookie_cache, max_sockets, url_cache),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+            bufsize=1,
+        )
+        self._lines: queue.Queue = queue.Queue()
+        self._stderr: deque = deque(maxlen=20)
+        self._next_id = 0
+        threading.Thread(target=self._pump_stdout, daemon=True).start()
+        threading.Thread(target=_drain, args=(self.proc.stderr, self._stderr), daemon=True).start()
+
+    def _pump_stdout(self):
+        for line in self.proc.stdout:
+            self._lines.put(line)
+        self._lines.put(None)  # 进程已退出
+
+    @property
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def stream(self, query: str, num: int, timeout: float = 30,
+               known: Iterable[str] = (), since: str = "",
+               resolve_urls: bool = False, resolve_concurrency: int = 4) -> Iterator[dict]:
+        """发送一次搜索请求，逐篇产出原始文章 dict；超时或进程退出时抛异常
+
+        等待限速令牌的时间不计入 timeout。
+        """
+        self._next_id += 1
+        req_id = self._next_id
+        req = {"id": req_id, "query": query, "num": num,
+               "resolve": resolve_urls, "resolve_concurrency": resolve_concurrency,
+               "since": since, "known": list(known)}
+        self.proc.stdin.write(json.dumps(req, ensure_ascii=False) + "\n")
+        self.proc.stdin.flush()
+
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                line = self._lines.get(timeout=max(remaining, 0))
+            except queue.Empty:
+                self.proc.kill()  # 卡住的 worker 直接丢弃，由 WorkerPool 重新拉起
+                raise TimeoutError(f"worker 超时（{timeout}s）")
+            if line is None:
+                raise RuntimeError(f"worker 已退出: {_tail(self._stderr)}")
+            msg = json.loads(line)
+            if "pace" in msg:
+                deadline += _answer_pace(msg, self.pacer, self.proc.stdin)
+                continue
+            if msg.get("id") != req_id:
+                continue  # ready 握手或已放弃的旧请求
+            if "error" in msg:
+                raise RuntimeError(msg["error"])
+            if msg.get("done"):
+                _raise_if_throttled(msg)
+                return
+            if "article" in msg:
+                yield msg["article"]
+
+    def close(self):
+        if not self.alive:
+            return
+        try:
+            self.proc.stdin.close()
+            self.proc.wait(timeout=5)
+        except Exception:
+            self.proc.kill()
+
+
+class WorkerPool:
+    """最多 size 个常驻 worker，按需启动，线程安全；退出时统一关闭"""
+
+    def __init__(self, script_path: str, size: int = 1, cookie_cache: str = "",
+                 max_sockets: int = 0, url_cache: str = "", pacer: Optional[Pacer] = None):
+        self.script_path = script_path
+        self.size = max(1, size)
+        self.cookie_cache = cookie_cache
+        self.max_sockets = max_sockets
+        self.url_cache = url_cache
+        self.pacer = pacer or Pacer()
+        self._idle: queue.Queue = queue.Queue()
+        self._workers: List[SearchWorker] = []
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> SearchWorker:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            live = [w for w in self._workers if w.alive]
+            if len(live) < self.size:
+                worker = SearchWorker(self.script_path, self.cookie_cache,
+                                      self.max_sockets, self.url_cache, self.pacer)
+                self._workers = live + [worker]
+                return worker
+        return self._idle.get()
+
+    def _release(self, worker: SearchWorker):
+        if worker.alive:
+            self._idle.put(worker)
+        else:
+            with self._lock:
+                self._workers = [w for w in self._workers if w is not worker]
+
+    def stream(self, query: str, num: int, timeout: float = 30, **options) -> Iterator[dict]:
+        worker = self._acquire()
+        try:
+            yield from worker.stream(query, num, timeout, **options)
+        finally:
+            self._release(worker)
+
+    def close(self):
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for w in workers:
+            w.close()
 
-def _parse_articles(raw: list, group: str = "") -> List[Article]:
-    result = []
-    for item in raw:
-        result.append(Article(
-            title    = item.get("title", "").strip(),
-            url      = item.get("url", "").strip(),
-            summary  = item.get("summary", "").replace("\n", " ").strip(),
-            datetime = item.get("datetime", ""),
-            source   = item.get("source", ""),
-            group    = group,
-        ))
-    return result
+    def __enter__(self):
+        return self
 
+    def __exit__(self, *exc):
+        self.close()
 
-def search(
+
+class SearchBackend:
+    """搜索后端接口：按查询逐篇产出原始文章 dict（字段同 search_wechat.js 输出）
+
+    known / since 只是翻页提前停止的提示，后端可以忽略；account 为账号名，
+    录制与回放按它命名文件（查询里带年月，跨月回放时对不上）。
+    被搜狗反爬拦截时抛 AntispiderError，超时抛 TimeoutError。
+    """
+
+    name = ""
+
+    def stream(self, query: str, num: int, known: Iterable[str] = (), since: str = "",
+               account: str = "") -> Iterator[dict]:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _NodeBackend(SearchBackend):
+    """调用 search_wechat.js 的后端公共部分：持有传给 node 的各项设置
+
+    cookie_cache 为搜狗 cookie 缓存文件路径，有效期内跨账号、跨运行复用。
+    resolve_urls 为 True 时把搜狗跳转链接解析为 mp.weixin.qq.com 真实链接，
+    同时在途的解析请求数由 resolve_concurrency 限制。
+    max_sockets 为 keep-alive 连接上限，0 表示用脚本默认值。
+    rate 为全局搜索页请求速率（次/秒）：所有 node 进程经同一个 Pacer 取令牌，
+    子进程后端每个账号换一个进程，限速与退避状态也不会丢失。
+    url_cache 为真实链接缓存文件：命中的文章不再请求，未开启解析时也会直接替换成真实链接。
+    """
+
+    def __init__(self, script_path: str, cookie_cache: str = "", max_sockets: int = 0,
+                 url_cache: str = "", rate: float = 0, resolve_urls: bool = False,
+                 resolve_concurrency: int = 4):
+        self.script_path = script_path
+        self.cookie_cache = cookie_cache
+        self.max_sockets = max_sockets
+        self.url_cache = url_cache
+        self.pacer = Pacer(rate)
+        self.resolve_urls = resolve_urls
+        self.resolve_concurrency = resolve_concurrency
+
+    def stream(self, query: str, num: int, known: Iterable[str] = (), since: str = "",
+               account: str = "") -> Iterator[dict]:
+        if not os.path.exists(self.script_path):
+            raise FileNotFoundError(f"搜索脚本不存在: {self.script_path}")
+        # 每次搜索重新读取：前面账号解析出的链接在后面账号即可命中
+        cache = UrlCache(self.url_cache) if self.url_cache else None
+        for item in self._raw(query, num, known, since, _timeout(num, self.resolve_urls)):
+            if cache:
+                item["url"] = cache.lookup(item.get("url", "").strip(),
+                                           item.get("title", ""), item.get("source", ""))
+            yield item
+
+    def _raw(self, query: str, num: int, known: Iterable[str], since: str,
+             timeout: float) -> Iterator[dict]:
+        raise NotImplementedError
+
+
+class SubprocessBackend(_NodeBackend):
+    """每次搜索启动一个一次性 node 进程（NDJSON 输出）"""
+
+    name = "subprocess"
+
+    def _raw(self, query, num, known, since, timeout):
+        return _stream_subprocess(query, self.script_path, num, self.cookie_cache, known,
+                                  since, self.resolve_urls, self.resolve_concurrency,
+                                  self.max_sockets, self.url_cache, self.pacer, timeout)
+
+
+class WorkerBackend(_NodeBackend):
+    """复用最多 size 个常驻 node worker（见 WorkerPool），省去每个账号的启动与握手"""
+
+    name = "worker"
+
+    def __init__(self, script_path: str, size: int = 1, **options):
+        super().__init__(script_path, **options)
+        self.pool = WorkerPool(script_path, size, self.cookie_cache, self.max_sockets,
+                               self.url_cache, self.pacer)
+
+    def _raw(self, query, num, known, since, timeout):
+        return self.pool.stream(query, num, timeout, known=known, since=since,
+                                resolve_urls=self.resolve_urls,
+                                resolve_concurrency=self.resolve_concurrency)
+
+    def close(self):
+        self.pool.close()
+
+
+def _fixture_name(key: str) -> str:
+    """录制文件名：去掉文件系统不允许的字符"""
+    return re.sub(r'[\\/:*?"<>|\s]+', "_", key).strip("_") or "_"
+
+
+class ReplayBackend(SearchBackend):
+    """从目录回放录制的搜索结果，不访问网络
+
+    每个账号一个文件：<账号>.ndjson（每行一篇文章，RecordingBackend 录制的格式），
+    或 <账号>.json（文章列表，或 `search_wechat.js -o` 输出的 {"articles": [...]}）。
+    没有账号名时按查询词查找。找不到录制文件时抛 FileNotFoundError。
+    """
+
+    name = "replay"
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+
+    def _load(self, key: str) -> List[dict]:
+        base = self.directory / _fixture_name(key)
+        ndjson = base.with_name(base.name + ".ndjson")
+        if ndjson.exists():
+            with open(ndjson, encoding="utf-8") as f:
+                return [json.loads(line) for line in f if line.strip()]
+        plain = base.with_name(base.name + ".json")
+        if plain.exists():
+            data = json.loads(plain.read_text(encoding="utf-8"))
+            return data.get("articles", []) if isinstance(data, dict) else data
+        raise FileNotFoundError(f"没有录制结果: {ndjson}")
+
+    def stream(self, query: str, num: int, known: Iterable[str] = (), since: str = "",
+               account: str = "") -> Iterator[dict]:
+        yield from self._load(account or query)[:num]
+
+
+class RecordingBackend(SearchBackend):
+    """包装另一个后端，把每个账号收到的文章录制到目录，供 ReplayBackend 回放
+
+    搜索出错或被拦截时录下已收到的部分结果，异常照常抛出。
+    """
+
+    def __init__(self, inner: SearchBackend, directory):
+        self.inner = inner
+        self.name = inner.name
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def stream(self, query: str, num: int, known: Iterable[str] = (), since: str = "",
+               account: str = "") -> Iterator[dict]:
+        items: List[dict] = []
+        try:
+            for item in self.inner.stream(query, num, known, since, account):
+                items.append(item)
+                yield item
+        finally:
+            path = self.directory / (_fixture_name(account or query) + ".ndjson")
+            tmp = path.with_name(path.name + ".tmp")
+            tmp.write_text("".join(json.dumps(i, ensure_ascii=False) + "\n" for i in items),
+                           encoding="utf-8")
+            os.replace(tmp, path)
+
+    def close(self):
+        self.inner.close()
+
+
+def make_backend(config) -> SearchBackend:
+    """按 config.search_backend 创建搜索后端；设置了 config.record_dir 时同时录制"""
+    kind = config.search_backend
+    if kind == "replay":
+        backend: SearchBackend = ReplayBackend(config.replay_dir)
+    elif kind in ("worker", "subprocess"):
+        options = dict(
+            cookie_cache=str(config.cookie_cache_path),
+            max_sockets=config.search_max_sockets,
+            url_cache=str(config.url_cache_path),
+            rate=config.crawl_rate,
+            resolve_urls=config.resolve_urls,
+            resolve_concurrency=config.resolve_concurrency,
+        )
+        if kind == "worker":
+            backend = WorkerBackend(config.search_script_path, config.crawl_concurrency,
+                                    **options)
+        else:
+            backend = SubprocessBackend(config.search_script_path, **options)
+    else:
+        raise ValueError(f"未知的搜索后端: {kind}（可选 worker / subprocess / replay）")
+    if config.record_dir:
+        backend = RecordingBackend(backend, config.record_dir)
+    return backend
+
+
+def iter_search(
+    query: str,
+    backend: SearchBackend,
+    num: int = 30,
+    group: str = "",
+    known: Iterable[str] = (),
+    since: str = "",
+    account: str = "",
+) -> Iterator[Article]:
+    """流式搜索：后端每收到一篇就产出 Article，出错时抛异常
+
+    backend 为 SearchBackend；传入脚本路径时按 SubprocessBackend 处理。
+    known 为已收录文章的键（见 store.article_key），某页全部已收录时停止翻页。
+    since 为截止日期（YYYY-MM-DD），某页最旧的文章早于它时停止翻页。
+    被搜狗反爬拦截时，已收到的文章照常产出，最后抛出 AntispiderError。
+    """
+    if isinstance(backend, (str, Path)):
+        backend = SubprocessBackend(str(backend))
+    for item in backend.stream(query, num, known, since, account):
+        yield _parse_article(item, group)
+
+
+def iter_account(
     account_name: str,
     query: str,
-    script_path: str,
+    backend: SearchBackend,
     num: int = 30,
     group: str = "",
-) -> List[Article]:
-    """调用 Node.js 脚本搜索微信文章，按日期倒序返回"""
-    if not os.path.exists(script_path):
-        print(f"  ⚠ 搜索脚本不存在: {script_path}")
-        return []
-
-    tmp_out = f"/tmp/wechat_search_{account_name.replace('/', '_')}.json"
-    cmd = ["node", script_path, query, "-n", str(num), "-o", tmp_out]
+    known: Iterable[str] = (),
+    since: str = "",
+    breaker: Optional[CircuitBreaker] = None,
+    notes: Optional[List[str]] = None,
+) -> Iterator[Article]:
+    """逐篇产出一个账号的搜索结果（后端返回的顺序），调用方可边收边处理
+
+    参数含义见 iter_search()；出错、超时或被拦截时不抛异常，已产出的即为部分结果。
+    传入 breaker 时各账号共享反爬熔断状态。
+    传入 notes 时警告追加到该列表，由调用方与账号的结果一起输出（并发时不致错位），
+    否则直接打印。
+    """
+    def warn(msg: str):
+        if notes is not None:
+            notes.append(msg)
+        else:
+            print(f"  {msg}", flush=True)
+
+    if breaker is not None and not breaker.allow():
+        warn(f"⚠ 已熔断，跳过 [{account_name}]")
+        return
+
+    count = 0
+    blocked = rate_limited = False
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-        if result.returncode != 0:
-            print(f"  ⚠ 搜索出错 [{account_name}]: {result.stderr[:200]}")
-            return []
-        if not os.path.exists(tmp_out):
-            return []
-        with open(tmp_out, encoding="utf-8") as f:
-            data = json.load(f)
-        raw = data.get("articles", data if isinstance(data, list) else [])
-        articles = _parse_articles(raw, group)
-        # 严格按发布时间倒序（最新在前）
-        articles.sort(key=lambda a: a.datetime or "0000-00-00", reverse=True)
-        return articles
-    except subprocess.TimeoutExpired:
-        print(f"  ⚠ 搜索超时 [{account_name}]")
-        return []
+        for a in iter_search(query, backend, num, group, known, since, account_name):
+            count += 1
+            yield a
+    except AntispiderError:
+        blocked = True
+        warn(f"⚠ 触发搜狗反爬 [{account_name}]（已收到 {count} 条）")
+    except RateLimitedError:
+        # 只是限流（Pacer 已全局减速），不算反爬拦截，不影响熔断状态
+        rate_limited = True
+        warn(f"⚠ 搜狗限流 [{account_name}]（已收到 {count} 条）")
+    except (subprocess.TimeoutExpired, TimeoutError):
+        warn(f"⚠ 搜索超时 [{account_name}]（已收到 {count} 条）")
     except Exception as e:
-        print(f"  ⚠ 搜索失败 [{account_name}]: {e}")
-        return []
+        warn(f"⚠ 搜索失败 [{account_name}]: {e}")
+    if breaker is not None and not rate_limited:
+        breaker.record(blocked)
+
+
+def search(account_name: str, query: str, backend: SearchBackend, num: int = 30,
+           **options) -> List[Article]:
+    """通过搜索后端搜索微信文章，按日期倒序返回（参数见 iter_account()）"""
+    articles = list(iter_account(account_name, query, backend, num, **options))
+    # 严格按发布时间倒序（最新在前）
+    articles.sort(key=attrgetter("ts"), reverse=True)
+    return articles
+
+
+class RecentFilter:
+    """边接收边筛选最近 days 天的文章，口径同 filter_recent()：
+    剔除过旧与没有日期的文章，同标题只保留最新一条
+    """
+
+    def __init__(self, days: int):
+        self.cutoff = _day_start(days)
+        self.seen = 0
+        self._latest: Dict[str, Article] = {}
+
+    def add(self, article: Article):
+        self.seen += 1
+        if article.ts < self.cutoff or article.ts <= 0:
+            return
+        key = article.title.strip()
+        kept = self._latest.get(key)
+        if kept is None or article.ts > kept.ts:
+            self._latest[key] = article
+
+    def articles(self) -> List[Article]:
+        """筛选结果，按发布时间倒序"""
+        return sorted(self._latest.values(), key=attrgetter("ts"), reverse=True)
+
+
+def _timeout(num: int, resolve_urls: bool) -> float:
+    """单次搜索的超时：翻页本身 30s，解析真实链接时每篇再预留 1s"""
+    return 30 + (num if resolve_urls else 0)
+
+
+def _node_args(cookie_cache: str = "", max_sockets: int = 0, url_cache: str = "") -> list:
+    args = []
+    if cookie_cache:
+        args += ["--cookie-cache", str(cookie_cache)]
+    if max_sockets:
+        args += ["--max-sockets", str(max_sockets)]
+    if url_cache:
+        args += ["--url-cache", str(url_cache)]
+    return args
+
+
+def _raise_if_throttled(done: dict):
+    """node 的结束消息标明被拦截 / 持续限流时抛出对应异常"""
+    if done.get("blocked"):
+        raise AntispiderError("触发搜狗反爬验证")
+    if done.get("rate_limited"):
+        raise RateLimitedError("搜狗持续返回 429")
+
+
+def _drain(stream, sink: deque):
+    for line in stream:
+        sink.append(line.rstrip())
+
+
+def _tail(lines: deque) -> str:
+    return " | ".join(list(lines)[-3:])[:200]
+
+
+def _stream_subprocess(query: str, script_path: str, num: int, cookie_cache: str = "",
+                       known: Iterable[str] = (), since: str = "",
+                       resolve_urls: bool = False, resolve_concurrency: int = 4,
+                       max_sockets: int = 0, url_cache: str = "",
+                       pacer: Optional[Pacer] = None, timeout: float = 30) -> Iterator[dict]:
+    pacer = pacer or Pacer()
+    cmd = ["node", script_path, query, "-n", str(num), "--ndjson", "--known-stdin",
+           "--pace-stdin"] + _node_args(cookie_cache, max_sockets, url_cache)
+    if since:
+        cmd += ["--since", since]
+    if resolve_urls:
+        cmd += ["-r", "--resolve-concurrency", str(resolve_concurrency)]
+    proc = subprocess.Popen(
+        cmd,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        encoding="utf-8",
+        errors="replace",
+    )
+    stderr: deque = deque(maxlen=20)
+    threading.Thread(target=_drain, args=(proc.stderr, stderr), daemon=True).start()
+    timed_out = threading.Event()
+    # 超时看门狗：等待限速令牌的时间不计入 timeout，截止时间随之顺延
+    deadline = [time.monotonic() + timeout]
+
+    def _watch():
+        while not done.wait(min(1.0, max(deadline[0] - time.monotonic(), 0))):
+            if time.monotonic() >= deadline[0]:
+                timed_out.set()
+                proc.kill()
+                return
+
+    done = threading.Event()
+    threading.Thread(target=_watch, daemon=True).start()
+    try:
+        try:
+            # 第一行为已收录文章键；stdin 保持打开，之后用于限速放行
+            proc.stdin.write(json.dumps(list(known), ensure_ascii=False) + "\n")
+            proc.stdin.flush()
+        except BrokenPipeError:
+            pass  # 进程已提前退出，错误信息见下方 stderr
+        for line in proc.stdout:
+            msg = json.loads(line)
+            if "pace" in msg:
+                deadline[0] += _answer_pace(msg, pacer, proc.stdin)
+                continue
+            if "error" in msg:
+                raise RuntimeError(msg["error"])
+            if msg.get("done"):
+                _raise_if_throttled(msg)
+            if "article" in msg:
+                yield msg["article"]
+        proc.wait()
+        if timed_out.is_set():
+            raise TimeoutError(f"搜索超时（{timeout}s）")
+        if proc.returncode != 0:
+            raise RuntimeError(_tail(stderr))
+    finally:
+        done.set()
+        if proc.poll() is None:
+            proc.kill()
+        try:
+            proc.stdin.close()
+        except OSError:
+            pass
 
 
 def filter_recent(articles: List[Article], days: int) -> List[Article]:
     """只保留最近 days 天的文章，并去重（同标题只取最新一条）"""
-    cutoff = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
-    recent = [a for a in articles if a.date >= cutoff]
-
-    # 去重：同标题只保留时间最新的一条
-    seen: dict[str, Article] = {}
-    for a in recent:
-        key = a.title.strip()
-        if key not in seen or a.datetime > seen[key].datetime:
-            seen[key] = a
-    return list(seen.values())
+    return ArticleBatch(articles).recent(days).latest_by_title().to_list()
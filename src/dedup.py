@@ -0,0 +1,124 @@
+"""跨账号近似重复文章聚类：MinHash + LSH
+
+多个公众号常以略有不同的标题报道同一事件。这里把 标题 + 摘要 切成字符 2-gram，
+用 MinHash 签名分桶（LSH）找候选，再以精确 Jaccard 相似度确认后归入簇，
+每簇只保留一篇代表文章，其余来源记在 Article.related 上。
+每篇文章只和同桶的文章比较，整体耗时随文章数线性增长。
+"""
+import random
+import re
+import zlib
+from typing import Dict, Iterable, List, Set, Tuple
+
+from .crawler import Article
+
+_NUM_PERM = 64
+_MASK64 = (1 << 64) - 1
+# multiply-shift 哈希族 h(x) = ((a·x + b) mod 2^64) >> 32；固定种子保证每次结果一致
+_rng = random.Random(20260217)
+_PERMS = [(_rng.getrandbits(64) | 1, _rng.getrandbits(64)) for _ in range(_NUM_PERM)]
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def _shingles(text: str, k: int = 2) -> Set[int]:
+    """去掉标点空白后的字符 k-gram，哈希成 32 位整数"""
+    text = _NON_WORD.sub("", text.lower())
+    if len(text) <= k:
+        grams: Iterable[str] = [text] if text else []
+    else:
+        grams = (text[i:i + k] for i in range(len(text) - k + 1))
+    return {zlib.crc32(g.encode("utf-8")) for g in grams}
+
+
+def _signature(shingles: Set[int]) -> Tuple[int, ...]:
+    return tuple(min([((a * x + b) & _MASK64) >> 32 for x in shingles]) for a, b in _PERMS)
+
+
+def _bands(threshold: float) -> Tuple[int, int]:
+    """选 bands × rows = _NUM_PERM，使 LSH 的 S 曲线拐点 (1/b)^(1/r) 略低于阈值（宁多勿漏）"""
+    target = max(threshold - 0.1, 0.05)
+    options = [(b, _NUM_PERM // b) for b in (4, 8, 16, 32) if _NUM_PERM % b == 0]
+    return min(options, key=lambda br: abs((1 / br[0]) ** (1 / br[1]) - target))
+
+
+def _jaccard(a: Set[int], b: Set[int]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _canonical_rank(a: Article):
+    # 最早发布的视为原始报道；同时发布取摘要更完整的一篇
+    return (a.ts or float("inf"), -len(a.summary))
+
+
+def collapse(
+    articles_by_account: Dict[str, List[Article]],
+    threshold: float = 0.5,
+) -> Dict[str, List[Article]]:
+    """跨账号合并近似重复文章，返回新的 {账号: 文章列表}
+
+    按发布时间从早到晚处理：与某个已有簇中任一文章的相似度（标题 + 摘要的 2-gram Jaccard）
+    不低于 threshold 即并入最相似的簇，否则自成一簇，以最早发布的一篇为代表。代表文章留在原账号下、原顺序不变，
+    簇内其他文章的来源写入它的 related 字段。同一账号的文章不会互相合并（多是系列文章）。
+    """
+    entries: List[Tuple[str, Article]] = [
+        (account, a) for account, arts in articles_by_account.items() for a in arts]
+    shingles = [_shingles(f"{a.title} {a.summary}") for _, a in entries]
+    bands, rows = _bands(threshold)
+
+    # LSH：已处理文章的签名按 band 分桶，新文章只和同桶文章所在的簇比较
+    buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = {}
+    cluster_of: Dict[int, int] = {}      # 文章 → 所在簇的代表
+    members: Dict[int, List[int]] = {}   # 代表 → 簇内其他文章
+    accounts: Dict[int, Set[str]] = {}   # 代表 → 簇内已有的账号（每个账号至多一篇）
+    order = sorted(range(len(entries)), key=lambda i: _canonical_rank(entries[i][1]))
+    for i in order:
+        account = entries[i][0]
+        if not shingles[i]:
+            continue
+        sig = _signature(shingles[i])
+        keys = [(b, sig[b * rows:(b + 1) * rows]) for b in range(bands)]
+
+        best, best_sim = -1, threshold
+        seen: Set[int] = set()
+        for key in keys:
+            for j in buckets.get(key, ()):
+                leader = cluster_of[j]
+                if j in seen or account in accounts[leader]:
+                    continue
+                seen.add(j)
+                sim = _jaccard(shingles[i], shingles[j])
+                if sim >= best_sim:
+                    best, best_sim = leader, sim
+
+        if best < 0:
+            best = i
+            members[i] = []
+            accounts[i] = set()
+        else:
+            members[best].append(i)
+        cluster_of[i] = best
+        accounts[best].add(account)
+        for key in keys:
+            buckets.setdefault(key, []).append(i)
+
+    dropped: Set[int] = set()
+    for leader, others in members.items():
+        if not others:
+            continue
+        canonical = entries[leader][1]
+        related: List[str] = []
+        for i in others:
+            dropped.add(i)
+            account, a = entries[i]
+            name = a.source or account
+            if name != canonical.source and name not in related:
+                related.append(name)
+        canonical.related = related
+
+    result: Dict[str, List[Article]] = {account: [] for account in articles_by_account}
+    for i, (account, a) in enumerate(entries):
+        if i not in dropped:
+            result[account].append(a)
+    return result
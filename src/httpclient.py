@@ -0,0 +1,409 @@
+"""共享 HTTP 客户端：按主机复用 keep-alive 连接，429/5xx 指数退避重试
+
+OpenRouter 与飞书的请求都经过这里：
+  - 同一主机的连接在请求之间保持，省去每次的 TCP + TLS 握手；
+  - 遇到 429/5xx 或连接被断开时按指数退避加随机抖动重试，响应带 Retry-After 时以它为准；
+  - 非幂等请求（POST/PATCH，除非调用方声明可重发）只在 429 或请求还没发出时重试，
+    5xx 或发出后断开时服务端可能已经执行，重发会造成重复写入；
+  - 每次调用有总时限（含重试等待），时间不够等下一次重试就直接报错；
+  - 记录每次调用的耗时、状态与尝试次数，运行结束时可汇总（summary）。
+与 urllib 一样遵循 HTTPS_PROXY / HTTP_PROXY / NO_PROXY 环境变量。
+"""
+import base64
+import http.client
+import json
+import random
+import select
+import socket
+import ssl
+import threading
+import time
+import urllib.parse
+import urllib.request
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+RETRY_STATUS = (429, 500, 502, 503, 504)
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+# 复用的空闲连接已被服务端关闭时会抛出这些异常，换新连接重发即可
+_STALE_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine,
+                 ConnectionResetError, BrokenPipeError)
+
+_PoolKey = Tuple[str, str, int]
+
+
+class HttpError(RuntimeError):
+    """HTTP 状态码 ≥ 400（可重试的状态码已重试到上限）"""
+
+    def __init__(self, status: int, body: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(f"HTTP {status}: {body[:300]}")
+        self.status = status
+        self.body = body
+        self.headers = headers or {}
+
+
+class Response:
+    """读取完毕的响应"""
+
+    __slots__ = ("status", "headers", "body")
+
+    def __init__(self, status: int, headers: Dict[str, str], body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    @property
+    def text(self) -> str:
+        return self.body.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.body.decode("utf-8"))
+
+
+class Timing:
+    """一次调用的耗时记录（含重试）"""
+
+    __slots__ = ("method", "host", "path", "status", "attempts", "seconds")
+
+    def __init__(self, method: str, host: str, path: str, status: str,
+                 attempts: int, seconds: float):
+        self.method = method
+        self.host = host
+        self.path = path
+        self.status = status        # 状态码，或异常类名
+        self.attempts = attempts
+        self.seconds = seconds
+
+    def __repr__(self) -> str:
+        return (f"Timing({self.method} {self.host}{self.path} {self.status} "
+                f"×{self.attempts} {self.seconds:.2f}s)")
+
+
+def _retry_after(headers: Dict[str, str]) -> Optional[float]:
+    """解析 Retry-After（秒数或 HTTP 日期），无法解析返回 None
+
+    没有 Retry-After 时参考飞书网关的 x-ogw-ratelimit-reset（距限流重置的秒数）。
+    """
+    value = (headers.get("retry-after") or headers.get("x-ogw-ratelimit-reset", "")).strip()
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class StreamResponse:
+    """流式响应：逐行迭代响应体；用作上下文管理器，结束时归还或关闭连接
+
+    正常退出且响应已读完（或剩余部分能立即读完）时连接回到池中，异常退出则关闭连接。
+    """
+
+    def __init__(self, client: "HttpClient", key: _PoolKey, conn: http.client.HTTPConnection,
+                 resp: http.client.HTTPResponse, timing: Timing, started: float):
+        self.status = resp.status
+        self.headers = {k.lower(): v for k, v in resp.getheaders()}
+        self._client = client
+        self._key = key
+        self._conn = conn
+        self._resp = resp
+        self._timing = timing
+        self._started = started
+
+    def __iter__(self) -> Iterator[bytes]:
+        while True:
+            line = self._resp.readline()
+            if not line:
+                return
+            yield line
+
+    def close(self, drain: bool = False):
+        if self._conn is None:
+            return
+        if drain and not self._resp.isclosed():
+            # 调用方读到结束标记就停了（如 SSE 的 [DONE]）：读掉剩下的结尾块，连接才能复用
+            try:
+                self._resp.read(1 << 16)
+            except (OSError, http.client.HTTPException):
+                pass
+        if self._resp.isclosed() and not self._resp.will_close:
+            self._client._release(self._key, self._conn)
+        else:
+            self._conn.close()
+        self._conn = None
+        self._timing.seconds = time.monotonic() - self._started
+        self._client._record(self._timing)
+
+    def __enter__(self) -> "StreamResponse":
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        self.close(drain=exc_type is None)
+
+
+class HttpClient:
+    """线程安全的 HTTP 客户端；每个主机最多保留 max_idle 条空闲连接
+
+    retries 为 429/5xx/连接错误的最大重试次数，第 n 次重试前等待
+    [0, min(max_backoff, backoff × 2^n)] 内的随机时长（full jitter）。
+    非幂等请求只重试 429 与连接建立阶段的错误；请求带幂等键等可安全重发时，
+    调用方传 idempotent=True 即按幂等请求处理。
+    """
+
+    def __init__(self, retries: int = 3, backoff: float = 0.5, max_backoff: float = 10.0,
+                 max_idle: int = 4):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_idle = max_idle
+        self.timings: Deque[Timing] = deque(maxlen=2000)
+        self._idle: Dict[_PoolKey, List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+        self._ssl = ssl.create_default_context()
+
+    # ── 连接池 ──────────────────────────────────────────────────────────────
+
+    def _connect(self, key: _PoolKey, timeout: float) -> http.client.HTTPConnection:
+        scheme, host, port = key
+        proxy = urllib.request.getproxies().get(scheme)
+        if proxy and not urllib.request.proxy_bypass(host):
+            p = urllib.parse.urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+            if scheme == "https":
+                conn = http.client.HTTPSConnection(p.hostname, p.port or 80, timeout=timeout,
+                                                   context=self._ssl)
+                auth = {}
+                if p.username:
+                    cred = f"{urllib.parse.unquote(p.username)}:{urllib.parse.unquote(p.password or '')}"
+                    auth["Proxy-Authorization"] = "Basic " + base64.b64encode(cred.encode()).decode()
+                conn.set_tunnel(host, port, headers=auth)
+                return conn
+            return http.client.HTTPConnection(p.hostname, p.port or 80, timeout=timeout)
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, port, timeout=timeout, context=self._ssl)
+        return http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def _acquire(self, key: _PoolKey, timeout: float) -> Tuple[http.client.HTTPConnection, bool]:
+        """取一条空闲连接（reused=True），没有则新建"""
+        with self._lock:
+            idle = self._idle.get(key)
+            conn = idle.pop() if idle else None
+        if conn is None:
+            return self._connect(key, timeout), False
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn, True
+
+    @staticmethod
+    def _dropped(conn: http.client.HTTPConnection) -> bool:
+        """空闲连接是否已被对端关闭（可读即意味着收到了 EOF 或意外数据）"""
+        try:
+            readable, _, _ = select.select([conn.sock], [], [], 0)
+        except (OSError, ValueError):
+            return True
+        return bool(readable)
+
+    def _release(self, key: _PoolKey, conn: http.client.HTTPConnection):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        """关闭所有空闲连接"""
+        with self._lock:
+            conns = [c for idle in self._idle.values() for c in idle]
+            self._idle.clear()
+        for c in conns:
+            c.close()
+
+    # ── 请求 ────────────────────────────────────────────────────────────────
+
+    def _record(self, timing: Timing):
+        with self._lock:
+            self.timings.append(timing)
+
+    def _delay(self, attempt: int, headers: Dict[str, str]) -> float:
+        after = _retry_after(headers)
+        if after is not None:
+            return after
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+
+    def _open(self, method: str, url: str, body: Optional[bytes], headers: Dict[str, str],
+              timeout: float, deadline: float, timing: Timing, idempotent: Optional[bool]):
+        """发出请求并按需重试，返回 (连接池键, 连接, 响应)；响应体由调用方读取"""
+        parts = urllib.parse.urlsplit(url)
+        scheme = parts.scheme or "https"
+        key = (scheme, parts.hostname or "", parts.port or (443 if scheme == "https" else 80))
+        target = parts.path or "/"
+        if parts.query:
+            target += f"?{parts.query}"
+        proxied = scheme == "http" and urllib.request.getproxies().get("http") \
+            and not urllib.request.proxy_bypass(key[1])
+        if proxied:
+            target = url   # 经 HTTP 代理时请求行用完整 URL
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+
+        end = time.monotonic() + deadline
+        attempt = 0
+        while True:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"{method} {parts.hostname}{parts.path} 超过 {deadline:.0f}s")
+            conn, reused = self._acquire(key, min(timeout, remaining))
+            if reused and not idempotent and self._dropped(conn):
+                conn.close()   # 发送前就发现空闲连接已失效：换新连接，不必冒重复写入的风险
+                continue
+            timing.attempts += 1
+            sent = False
+            try:
+                if conn.sock is None:
+                    conn.connect()   # 单独建连：此阶段出错说明请求一个字节都没发出，总能重试
+                sent = True
+                conn.request(method, target, body=body, headers=headers)
+                resp = conn.getresponse()
+            except _STALE_ERRORS as e:
+                conn.close()
+                if reused and idempotent:
+                    timing.attempts -= 1   # 空闲连接已失效，换新连接重发，不计入重试
+                    continue
+                error: Exception = e
+                resp_headers: Dict[str, str] = {}
+            except socket.timeout:
+                conn.close()
+                raise
+            except OSError as e:
+                conn.close()
+                error, resp_headers = e, {}
+            else:
+                # 非幂等请求收到 5xx 时服务端可能已执行，原样交给调用方
+                if resp.status not in RETRY_STATUS or (resp.status != 429 and not idempotent):
+                    return key, conn, resp
+                resp_headers = {k.lower(): v for k, v in resp.getheaders()}
+                data = resp.read()
+                if resp.will_close:
+                    conn.close()
+                else:
+                    self._release(key, conn)
+                error = HttpError(resp.status, data.decode("utf-8", errors="replace"), resp_headers)
+
+            timing.status = str(getattr(error, "status", type(error).__name__))
+            # 非幂等请求发出后连接出错：不知道服务端是否已执行，不重发
+            if attempt >= self.retries or (sent and not idempotent and not isinstance(error, HttpError)):
+                raise error
+            wait = self._delay(attempt, resp_headers)
+            if time.monotonic() + wait >= end:
+                raise error
+            time.sleep(wait)
+            attempt += 1
+
+    def request(self, method: str, url: str, body: Optional[bytes] = None,
+                headers: Optional[Dict[str, str]] = None, timeout: float = 15,
+                deadline: Optional[float] = None, idempotent: Optional[bool] = None) -> Response:
+        """发送请求并读完响应；状态码 ≥ 400 抛 HttpError
+
+        timeout 为单次网络读写的超时；deadline 为整个调用（含重试等待）的时限，
+        默认 timeout × 2。超时（socket.timeout）不重试，直接抛出。
+        idempotent 默认按方法判断（见 IDEMPOTENT_METHODS）。
+        """
+        parts = urllib.parse.urlsplit(url)
+        timing = Timing(method, parts.hostname or "", parts.path, "", 0, 0.0)
+        started = time.monotonic()
+        try:
+            key, conn, resp = self._open(method, url, body, headers or {}, timeout,
+                                         deadline or timeout * 2, timing, idempotent)
+            try:
+                data = resp.read()
+            except BaseException:
+                conn.close()
+                raise
+            if resp.will_close:
+                conn.close()
+            else:
+                self._release(key, conn)
+            timing.status = str(resp.status)
+        except BaseException as e:
+            if not timing.status:
+                timing.status = type(e).__name__
+            timing.seconds = time.monotonic() - started
+            self._record(timing)
+            raise
+        timing.seconds = time.monotonic() - started
+        self._record(timing)
+
+        resp_headers = {k.lower(): v for k, v in resp.getheaders()}
+        if resp.status >= 400:
+            raise HttpError(resp.status, data.decode("utf-8", errors="replace"), resp_headers)
+        return Response(resp.status, resp_headers, data)
+
+    def stream(self, method: str, url: str, body: Optional[bytes] = None,
+               headers: Optional[Dict[str, str]] = None, timeout: float = 15,
+               deadline: Optional[float] = None,
+               idempotent: Optional[bool] = None) -> StreamResponse:
+        """发送请求，收到响应头即返回 StreamResponse，由调用方逐行读取
+
+        重试只发生在收到响应头之前；timeout 同时是读取每一行的超时。
+        """
+        parts = urllib.parse.urlsplit(url)
+        timing = Timing(method, parts.hostname or "", parts.path, "", 0, 0.0)
+        started = time.monotonic()
+        try:
+            key, conn, resp = self._open(method, url, body, headers or {}, timeout,
+                                         deadline or timeout * 2, timing, idempotent)
+        except BaseException as e:
+            if not timing.status:
+                timing.status = type(e).__name__
+            timing.seconds = time.monotonic() - started
+            self._record(timing)
+            raise
+        timing.status = str(resp.status)
+        if resp.status >= 400:
+            data = resp.read()
+            conn.close()
+            timing.seconds = time.monotonic() - started
+            self._record(timing)
+            raise HttpError(resp.status, data.decode("utf-8", errors="replace"),
+                            {k.lower(): v for k, v in resp.getheaders()})
+        return StreamResponse(self, key, conn, resp, timing, started)
+
+    def summary(self) -> str:
+        """按主机汇总请求次数、平均耗时与重试/失败次数"""
+        with self._lock:
+            timings = list(self.timings)
+        by_host: Dict[str, List[Timing]] = {}
+        for t in timings:
+            by_host.setdefault(t.host, []).append(t)
+        parts = []
+        for host, ts in by_host.items():
+            avg = sum(t.seconds for t in ts) / len(ts)
+            text = f"{host} {len(ts)} 次，平均 {avg:.2f}s"
+            retried = sum(t.attempts - 1 for t in ts if t.attempts > 1)
+            failed = sum(1 for t in ts if not t.status.isdigit() or int(t.status) >= 400)
+            if retried:
+                text += f"，重试 {retried} 次"
+            if failed:
+                text += f"，失败 {failed} 次"
+            parts.append(text)
+        return "；".join(parts)
+
+
+_default: Optional[HttpClient] = None
+_default_lock = threading.Lock()
+
+
+def default_client() -> HttpClient:
+    """进程内共享的客户端（首次调用时创建）"""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = HttpClient()
+        return _default
@@ -1,4 +1,4 @@
-from .feishu import output as feishu_output
+from .feishu import FeishuSink, output as feishu_output
 from .local import output as local_output
 
-__all__ = ["feishu_output", "local_output"]
+__all__ = ["FeishuSink", "feishu_output", "local_output"]
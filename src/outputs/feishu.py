@@ -1,38 +1,150 @@
 """飞书文档输出"""
 import json
-import urllib.error
+import os
+import random
+import threading
+import time
 import urllib.parse
-import urllib.request
-from typing import Dict, List, Optional
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
+from .. import httpclient
 from ..crawler import Article
+from ..store import article_key
+from ..topics import OTHER_TOPIC, Topic
 
 FEISHU_BASE = "https://open.feishu.cn/open-apis"
 
+# tenant_access_token 无效/过期时返回的错误码，遇到时重新获取 token 再试一次
+AUTH_ERROR_CODES = {99991661, 99991663, 99991664, 99991665, 99991668, 99991677}
+TOKEN_REFRESH_MARGIN = 300   # token 剩余有效期不足 5 分钟即提前刷新
+# 请求频率超限的错误码：按 x-ogw-ratelimit-reset（或指数退避）等待后重试
+RATE_LIMIT_CODES = {99991400}
+RATE_LIMIT_RETRIES = 5
+# 文档不存在 / 已删除 / 应用无权访问：更新模式下据此改为新建文档，其他错误照常抛出
+DOC_GONE_CODES = {1770002, 1770003, 1770032}
+MAX_BATCH_BLOCKS = 1000      # descendant 接口单次最多创建的块数
+
+
+class ApiError(RuntimeError):
+    """飞书 API 返回错误：HTTP 状态码与业务错误码（无法解析时为 None）"""
+
+    def __init__(self, message: str, status: int = 200, code: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+
+
+class TokenInvalid(ApiError):
+    """飞书返回 token 无效/过期"""
+
+
+def _rate_limit_wait(headers: Dict[str, str], attempt: int) -> float:
+    try:
+        return max(0.0, float(headers["x-ogw-ratelimit-reset"]))
+    except (KeyError, ValueError):
+        return random.uniform(0, min(8.0, 0.5 * (2 ** attempt)))
+
 
 # ─── 飞书 API 工具 ───────────────────────────────────────────────────────────
 
-def _request(method: str, path: str, token: str = None, body: dict = None) -> dict:
+def _request(method: str, path: str, token: str = None, body: dict = None,
+             idempotent: Optional[bool] = None) -> dict:
+    """调用飞书 API；idempotent=True 表示重发安全（如带了 client_token），5xx 时也重试"""
     url = f"{FEISHU_BASE}{path}"
     headers = {"Content-Type": "application/json; charset=utf-8"}
     if token:
         headers["Authorization"] = f"Bearer {token}"
     data = json.dumps(body, ensure_ascii=False).encode("utf-8") if body else None
-    req = urllib.request.Request(url, data=data, headers=headers, method=method)
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        try:
+            # 复用到 open.feishu.cn 的连接；HTTP 429（幂等请求还有 5xx）由 httpclient 退避重试
+            r = httpclient.default_client().request(method, url, data, headers, timeout=15,
+                                                    idempotent=idempotent)
+            resp, status, resp_headers = r.json(), r.status, r.headers
+        except httpclient.HttpError as e:
+            try:
+                resp = json.loads(e.body)
+                code = resp.get("code")
+            except (ValueError, AttributeError):
+                resp, code = {}, None
+            if token and code in AUTH_ERROR_CODES:
+                raise TokenInvalid(f"飞书 token 失效 (code={code})", e.status, code) from None
+            # 频率超限但不是 HTTP 429（429 已在 httpclient 重试过）：在这里退避重试
+            if code not in RATE_LIMIT_CODES or e.status == 429 or attempt == RATE_LIMIT_RETRIES:
+                raise ApiError(f"飞书 API HTTP {e.status}: {e.body[:300]}", e.status, code) from None
+            status, resp_headers = e.status, e.headers
+        code = resp.get("code")
+        if token and code in AUTH_ERROR_CODES:
+            raise TokenInvalid(f"飞书 token 失效 (code={code})", status, code)
+        if code in RATE_LIMIT_CODES and attempt < RATE_LIMIT_RETRIES:
+            time.sleep(_rate_limit_wait(resp_headers, attempt))
+            continue
+        return resp
+
+
+# ─── tenant_access_token 缓存 ────────────────────────────────────────────────
+# 进程内按 app_id 缓存（同一次运行中的多次调用共用），同时写入磁盘；
+# ui.py 每个任务都单独启动 run.py，跨任务、跨运行复用 token 靠的是磁盘缓存
+
+_token_lock = threading.Lock()
+_tokens: Dict[str, Tuple[str, float]] = {}   # app_id → (token, 过期时间戳)
+
+
+def _read_token_file(path: Path) -> Dict[str, Tuple[str, float]]:
     try:
-        with urllib.request.urlopen(req, timeout=15) as resp:
-            return json.loads(resp.read().decode("utf-8"))
-    except urllib.error.HTTPError as e:
-        raise RuntimeError(f"飞书 API HTTP {e.code}: {e.read().decode('utf-8')[:300]}")
+        data = json.loads(path.read_text(encoding="utf-8"))
+        return {k: (v["token"], float(v["expires_at"])) for k, v in data.items()}
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return {}
 
 
-def _get_token(app_id: str, app_secret: str) -> str:
-    resp = _request("POST", "/auth/v3/tenant_access_token/internal", body={
-        "app_id": app_id, "app_secret": app_secret,
-    })
-    if resp.get("code") != 0:
-        raise RuntimeError(f"获取 token 失败: {resp}")
-    return resp["tenant_access_token"]
+def _write_token_file(path: Path, app_id: str, token: str, expires_at: float):
+    entries = _read_token_file(path)
+    entries[app_id] = (token, expires_at)
+    now = time.time()
+    data = {k: {"token": t, "expires_at": e} for k, (t, e) in entries.items() if e > now}
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        # token 等同于应用凭证，只允许当前用户读写
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"  ⚠ 写入飞书 token 缓存失败: {e}")
+
+
+def _get_token(app_id: str, app_secret: str, cache_path: Optional[Path] = None,
+               force: bool = False) -> str:
+    """获取 tenant_access_token：优先用缓存（进程内，其次 cache_path 磁盘缓存——
+    每次运行、ui.py 的每个任务都是新进程，跨运行复用只靠它），
+    剩余有效期不足 TOKEN_REFRESH_MARGIN 秒或 force=True 时重新获取"""
+    with _token_lock:
+        now = time.time()
+        if not force:
+            cached = _tokens.get(app_id)
+            if cached is None and cache_path is not None:
+                cached = _read_token_file(cache_path).get(app_id)
+            if cached and cached[1] - TOKEN_REFRESH_MARGIN > now:
+                _tokens[app_id] = cached
+                return cached[0]
+
+        resp = _request("POST", "/auth/v3/tenant_access_token/internal", body={
+            "app_id": app_id, "app_secret": app_secret,
+        }, idempotent=True)
+        if resp.get("code") != 0:
+            raise RuntimeError(f"获取 token 失败: {resp}")
+        token = resp["tenant_access_token"]
+        expires_at = now + float(resp.get("expire", 7200))
+        _tokens[app_id] = (token, expires_at)
+        if cache_path is not None:
+            _write_token_file(cache_path, app_id, token, expires_at)
+        return token
 
 
 def _create_doc(token: str, title: str) -> str:
@@ -42,15 +154,91 @@ def _create_doc(token: str, title: str) -> str:
     return resp["data"]["document"]["document_id"]
 
 
-def _append_blocks(token: str, doc_id: str, blocks: list) -> None:
+def _insert_blocks(token: str, doc_id: str, blocks: list, index: int = -1) -> List[str]:
+    """用 descendant 接口在文档根节点下一次插入一批块（标题与其下的列表同一次请求）
+
+    index 为插入位置，-1 表示追加到末尾。返回新块的 block_id（与 blocks 一一对应）。
+    带 client_token 幂等键，5xx 后重发不会插入重复的块。
+    """
+    ids = [f"b{i}" for i in range(len(blocks))]
     resp = _request(
         "POST",
-        f"/docx/v1/documents/{doc_id}/blocks/{doc_id}/children",
+        f"/docx/v1/documents/{doc_id}/blocks/{doc_id}/descendant?client_token={uuid.uuid4()}",
         token=token,
-        body={"children": blocks, "index": -1},
+        idempotent=True,
+        body={
+            "children_id": ids,
+            "descendants": [dict(b, block_id=i, children=[]) for i, b in zip(ids, blocks)],
+            "index": index,
+        },
     )
     if resp.get("code") != 0:
-        raise RuntimeError(f"追加块失败 (code={resp.get('code')}): {resp}")
+        raise ApiError(f"插入块失败 (code={resp.get('code')}): {resp}", 200, resp.get("code"))
+    relations = {r["temporary_block_id"]: r["block_id"]
+                 for r in resp.get("data", {}).get("block_id_relations", [])}
+    return [relations.get(i, "") for i in ids]
+
+
+def _list_children(token: str, doc_id: str) -> List[str]:
+    """文档根节点下各块的 block_id（按文档顺序）"""
+    ids: List[str] = []
+    page_token = ""
+    while True:
+        query = "page_size=500" + (f"&page_token={page_token}" if page_token else "")
+        resp = _request("GET", f"/docx/v1/documents/{doc_id}/blocks/{doc_id}/children?{query}",
+                        token=token)
+        if resp.get("code") != 0:
+            raise ApiError(f"读取文档结构失败: {resp}", 200, resp.get("code"))
+        data = resp.get("data", {})
+        ids += [item["block_id"] for item in data.get("items", [])]
+        page_token = data.get("page_token", "")
+        if not data.get("has_more") or not page_token:
+            return ids
+
+
+def _delete_range(token: str, doc_id: str, start: int, end: int) -> None:
+    """删除文档根节点下 [start, end) 位置的块
+
+    按位置删除重发一次就会多删一段，带 client_token 幂等键保证重试只生效一次。
+    """
+    resp = _request("DELETE", f"/docx/v1/documents/{doc_id}/blocks/{doc_id}/children/batch_delete"
+                              f"?client_token={uuid.uuid4()}",
+                    token=token, body={"start_index": start, "end_index": end})
+    if resp.get("code") != 0:
+        raise ApiError(f"删除块失败: {resp}", 200, resp.get("code"))
+
+
+def _update_text(token: str, doc_id: str, block_id: str, elements: list) -> None:
+    """原地替换文本类块（含文档标题所在的 page 块）的内容"""
+    resp = _request("PATCH", f"/docx/v1/documents/{doc_id}/blocks/{block_id}", token=token,
+                    body={"update_text_elements": {"elements": elements}},
+                    idempotent=True)   # 整体替换内容，重发结果相同
+    if resp.get("code") != 0:
+        raise ApiError(f"更新块失败: {resp}", 200, resp.get("code"))
+
+
+def _doc_exists(token: str, doc_id: str) -> bool:
+    """文档是否仍可访问；只有确认已删除或无权限时返回 False，5xx、限流等临时错误照常抛出"""
+    try:
+        resp = _request("GET", f"/docx/v1/documents/{doc_id}", token=token)
+    except TokenInvalid:
+        raise
+    except ApiError as e:
+        if e.code in DOC_GONE_CODES or (e.code is None and e.status in (403, 404)):
+            return False
+        raise
+    code = resp.get("code")
+    if code == 0:
+        return True
+    if code in DOC_GONE_CODES:
+        return False
+    raise ApiError(f"查询文档失败: {resp}", 200, code)
+
+
+def _delete_doc(token: str, doc_id: str) -> None:
+    resp = _request("DELETE", f"/drive/v1/files/{doc_id}?type=docx", token=token)
+    if resp.get("code") != 0:
+        raise RuntimeError(f"删除文档失败: {resp}")
 
 
 def _share(token: str, doc_id: str, open_id: str) -> None:
@@ -93,79 +281,394 @@ def _bullet_block(elements: list) -> dict:
     return {"block_type": 12, "bullet": {"elements": elements, "style": {"align": 1}}}
 
 
-# ─── 主输出函数 ──────────────────────────────────────────────────────────────
-
-def output(
-    articles_by_account: Dict[str, List[Article]],
-    ai_summary: Optional[str],
-    title: str,
-    date_range: str,
-    config,
-) -> str:
-    """输出到飞书文档，返回文档链接"""
-
-    token = _get_token(config.feishu_app_id, config.feishu_app_secret)
-    doc_id = _create_doc(token, title)
-    print(f"  ✓ 文档创建: https://feishu.cn/docx/{doc_id}")
-
-    total = sum(len(v) for v in articles_by_account.values())
-    summary_parts = [f"{n}: {len(a)}篇" for n, a in articles_by_account.items()]
-
-    blocks = []
-
-    # 元信息
-    blocks.append(_text_block(f"爬取范围: {date_range}  |  合计: {total}篇  |  {'  '.join(summary_parts)}"))
-    blocks.append(_text_block("数据来源: 搜狗微信搜索（链接点击后跳转原文）"))
-
-    # AI 摘要（如有）
-    if ai_summary:
-        blocks.append(_heading2_block("📊 AI 智能摘要"))
-        for line in ai_summary.splitlines():
-            line = line.strip()
-            if not line:
-                continue
-            if line.startswith("## ") or line.startswith("### "):
-                heading = line.lstrip("#").strip()
-                blocks.append(_text_block(f"▶ {heading}"))
-            elif line.startswith("- ") or line.startswith("• "):
-                blocks.append(_bullet_block([_text_elem(line[2:].strip())]))
-            elif line.startswith("**") and line.endswith("**"):
-                blocks.append(_text_block(line.strip("*")))
-            else:
-                blocks.append(_text_block(line))
-
-    # 各账号文章（按 group 分组显示）
+# ─── 文档内容 ────────────────────────────────────────────────────────────────
+
+def _meta_blocks(counts: Dict[str, int], date_range: str) -> list:
+    """元信息：counts 为各账号在文档中的文章数"""
+    total = sum(counts.values())
+    summary_parts = [f"{n}: {c}篇" for n, c in counts.items()]
+    return [
+        _text_block(f"爬取范围: {date_range}  |  合计: {total}篇  |  {'  '.join(summary_parts)}"),
+        _text_block("数据来源: 搜狗微信搜索（链接点击后跳转原文）"),
+    ]
+
+
+def _summary_blocks(ai_summary: str) -> list:
+    blocks = [_heading2_block("📊 AI 智能摘要")]
+    for line in ai_summary.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("## ") or line.startswith("### "):
+            heading = line.lstrip("#").strip()
+            blocks.append(_text_block(f"▶ {heading}"))
+        elif line.startswith("- ") or line.startswith("• "):
+            blocks.append(_bullet_block([_text_elem(line[2:].strip())]))
+        elif line.startswith("**") and line.endswith("**"):
+            blocks.append(_text_block(line.strip("*")))
+        else:
+            blocks.append(_text_block(line))
+    return blocks
+
+
+def _article_bullet(a: Article, suffix: str = "") -> dict:
+    elems = [_text_elem(f"[{a.date}]  ")]
+    if a.url:
+        elems.append(_text_elem(a.title, link=a.url))
+    else:
+        elems.append(_text_elem(a.title, bold=True))
+    if suffix:
+        elems.append(_text_elem(suffix))
+    return _bullet_block(elems)
+
+
+def _heading1_block(text: str) -> dict:
+    return {"block_type": 3, "heading1": {"elements": [_text_elem(text)], "style": {"align": 1}}}
+
+
+def _topic_blocks(topics: Optional[List[Topic]]) -> list:
+    """按主题（本地聚类，未归类的文章只在下方按账号列出）"""
+    clustered = [t for t in topics or [] if t.label != OTHER_TOPIC]
+    if not clustered:
+        return []
+    blocks = [_heading1_block("🗂 按主题")]
+    for t in clustered:
+        blocks.append(_heading2_block(f"{t.label}（{len(t.articles)}篇）"))
+        blocks += [_article_bullet(a, f"  · {a.source}") for a in t.articles]
+    return blocks
+
+
+def _also(a: Article) -> str:
+    return f"  （另见：{'、'.join(a.related)}）" if a.related else ""
+
+
+def _account_blocks(articles_by_account: Dict[str, List[Article]]) -> Tuple[list, list]:
+    """各账号文章（按 group 分组显示），返回 (块, 标记)
+
+    标记与块一一对应：("group", 板块) / ("account", 账号, 标题上的篇数) / ("article", 文章唯一键, 账号)，
+    更新模式据此记录各块的 block_id。
+    """
     by_group: dict = {}
     for account, articles in articles_by_account.items():
         g = articles[0].group if articles else "其他"
         by_group.setdefault(g, {})[account] = articles
 
+    blocks, tags = [], []
     for group_name, group_accounts in by_group.items():
         # 分组标题
-        blocks.append({
-            "block_type": 3,
-            "heading1": {"elements": [_text_elem(f"📂 {group_name}")], "style": {"align": 1}},
-        })
+        blocks.append(_heading1_block(f"📂 {group_name}"))
+        tags.append(("group", group_name))
         for account, articles in group_accounts.items():
             blocks.append(_heading2_block(f"{account}（{len(articles)}篇）"))
+            tags.append(("account", account, len(articles)))
             for a in articles:
-                elems = [_text_elem(f"[{a.date}]  ")]
-                if a.url:
-                    elems.append(_text_elem(a.title, link=a.url))
-                else:
-                    elems.append(_text_elem(a.title, bold=True))
-                blocks.append(_bullet_block(elems))
-
-    # 分批写入（单次最多 40 块）
-    chunk_size = 40
-    for i in range(0, len(blocks), chunk_size):
-        chunk = blocks[i: i + chunk_size]
-        _append_blocks(token, doc_id, chunk)
-        print(f"  ✓ 块 {i+1}~{min(i+chunk_size, len(blocks))}/{len(blocks)}")
-
-    # 共享权限
-    if config.feishu_share_openid:
-        _share(token, doc_id, config.feishu_share_openid)
-        print(f"  ✓ 已共享给 {config.feishu_share_openid}")
-
-    return f"https://feishu.cn/docx/{doc_id}"
+                blocks.append(_article_bullet(a, _also(a)))
+                tags.append(("article", article_key(a.title, a.source), account))
+    return blocks, tags
+
+
+def _batch_len(blocks: list, start: int, limit: int) -> int:
+    """从 start 起取不超过 limit 块；放不下全部时尽量在标题块（一级/二级）前断开"""
+    end = min(start + limit, len(blocks))
+    if end == len(blocks):
+        return end - start
+    for i in range(end, start, -1):
+        if blocks[i]["block_type"] in (3, 4):
+            return i - start
+    return end - start
+
+
+# ─── 流水线输出 ──────────────────────────────────────────────────────────────
+
+def _load_doc_map(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_doc_map(path: Path, key: str, state: dict):
+    entries = _load_doc_map(path)
+    entries[key] = state
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(entries, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"  ⚠ 写入飞书文档映射失败: {e}")
+
+
+_PERIOD_FORMATS = {"day": "%Y-%m-%d", "week": "%G-W%V", "month": "%Y-%m"}
+
+
+def _period_key(config) -> str:
+    """更新模式下文档的归属：同一应用、同一组账号、同一周期（自然日/周/月）共用一篇文档"""
+    period = datetime.now().strftime(_PERIOD_FORMATS.get(config.feishu_doc_period, "%G-W%V"))
+    return f"{config.feishu_app_id}|{'·'.join(config.accounts)}|{period}"
+
+
+class FeishuSink:
+    """飞书输出作为流水线的一个阶段，与爬取、AI 摘要重叠进行
+
+    创建时即在后台获取 token 并创建文档；write_articles() 在爬取结束后把元信息与文章列表
+    排进后台追加，此时 AI 摘要可以同时生成；finish() 把 AI 摘要插到元信息之后，
+    共享文档并返回链接。所有飞书请求都在同一个后台线程里按提交顺序执行，
+    任何一步失败都在 finish() 时抛出。后台进度先记下，finish() 时再打印，
+    以免打断终端上流式输出的 AI 摘要。
+
+    update=True 时同一周期（见 _period_key）复用上次的文档：本地记录文档 ID 及各块的
+    block_id（CACHE_DIR/feishu_docs.json），重跑时只在各账号标题下插入新文章、
+    更新标题与计数，并替换 AI 摘要与「按主题」部分；记录的文档已不可访问时新建。
+    文档结构固定为：元信息 → AI 摘要 → 按主题 → 各板块/账号的文章。
+    """
+
+    def __init__(self, config, title: str, update: bool = False):
+        self.config = config
+        self.title = title
+        self._token = ""
+        self._doc_id = ""
+        self._update = update
+        self._key = _period_key(config) if update else ""
+        self._fresh = True      # 本次新建的文档（否则为更新已有文档）
+        # 各部分的 block_id：meta / summary / topics 为列表，groups / accounts / articles 为字典；
+        # counts 为各账号实际写入的篇数，shown 为账号标题上显示的篇数
+        self._state: dict = {}
+        self._batch_size = MAX_BATCH_BLOCKS   # 被 API 拒绝时减半，之后的批次沿用
+        self._log: List[str] = []
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="feishu")
+        self._pending: List[Future] = [self._pool.submit(self._open)]
+
+    @property
+    def url(self) -> str:
+        return f"https://feishu.cn/docx/{self._doc_id}"
+
+    def _call(self, fn, *args, **kwargs):
+        """以当前 token 调用飞书 API；token 失效时强制重新获取并重试一次"""
+        try:
+            return fn(self._token, *args, **kwargs)
+        except TokenInvalid:
+            self._token = _get_token(self.config.feishu_app_id, self.config.feishu_app_secret,
+                                     self.config.feishu_token_path, force=True)
+            self._log.append("  ↻ 飞书 token 已失效，重新获取")
+            return fn(self._token, *args, **kwargs)
+
+    def _open(self):
+        self._token = _get_token(self.config.feishu_app_id, self.config.feishu_app_secret,
+                                 self.config.feishu_token_path)
+        if self._update:
+            state = _load_doc_map(self.config.feishu_doc_map_path).get(self._key)
+            if state and self._call(_doc_exists, state["document_id"]):
+                self._state = state
+                self._doc_id = state["document_id"]
+                self._fresh = False
+                self._log.append(f"  ✓ 更新已有文档: {self.url}")
+                return
+        self._doc_id = self._call(_create_doc, self.title)
+        self._state = {"document_id": self._doc_id, "meta": [], "summary": [], "topics": [],
+                       "groups": {}, "accounts": {}, "counts": {}, "shown": {}, "articles": {}}
+        self._log.append(f"  ✓ 文档创建: {self.url}")
+
+    def _write(self, blocks: list, index: int = -1, label: str = "块",
+               tags: Optional[list] = None) -> List[str]:
+        """分批写入，返回新块的 block_id；index ≥ 0 时从该位置起依次插入，否则追加到末尾
+
+        每批尽量大（最多 MAX_BATCH_BLOCKS 块），在标题处断开；
+        某批被 API 拒绝（4xx、业务错误码）时批量减半重试，减到 1 块仍失败才报错。
+        给出 tags（与 blocks 一一对应）时每批写成功即记入文档映射，中途失败也不丢已写的部分。
+        """
+        ids: List[str] = []
+        pos = 0
+        while pos < len(blocks):
+            n = _batch_len(blocks, pos, self._batch_size)
+            started = time.monotonic()
+            try:
+                ids += self._call(_insert_blocks, self._doc_id, blocks[pos: pos + n],
+                                  index=index + pos if index >= 0 else -1)
+            except ApiError as e:
+                if n == 1 or e.status >= 500 or e.code in RATE_LIMIT_CODES:
+                    raise
+                self._batch_size = max(1, n // 2)
+                self._log.append(f"  ↓ {n} 块一批被拒绝（{e}），改为每批 {self._batch_size} 块")
+                continue
+            if tags:
+                self._remember(tags[pos: pos + n], ids[pos:])
+            self._log.append(f"  ✓ {label} {pos+1}~{pos+n}/{len(blocks)}"
+                             f"（{time.monotonic() - started:.2f}s）")
+            pos += n
+        return ids
+
+    def _remember(self, tags: list, ids: List[str]):
+        """记下已写入块的 block_id；账号篇数按实际写入的文章累计
+
+        标记除 _account_blocks 的三种外，还有 ("meta",) / ("topics",) / ("summary",)，
+        按顺序追加到对应列表。
+        """
+        st = self._state
+        for tag, block_id in zip(tags, ids):
+            kind = tag[0]
+            if kind in ("meta", "topics", "summary"):
+                st[kind].append(block_id)
+            elif kind == "group":
+                st["groups"][tag[1]] = block_id
+            elif kind == "account":
+                st["accounts"][tag[1]] = block_id
+                st["counts"][tag[1]] = 0   # 新写的标题下还没有文章
+                st.setdefault("shown", {})[tag[1]] = tag[2]
+            else:
+                st["articles"][tag[1]] = block_id
+                st["counts"][tag[2]] = st["counts"].get(tag[2], 0) + 1
+
+    def write_articles(self, articles_by_account: Dict[str, List[Article]], date_range: str,
+                       topics: Optional[List[Topic]] = None):
+        """后台写入元信息与文章列表（更新模式下只写新增部分），立即返回"""
+        self._pending.append(self._pool.submit(
+            self._write_articles, articles_by_account, date_range, topics))
+
+    def _write_articles(self, articles_by_account: Dict[str, List[Article]], date_range: str,
+                        topics: Optional[List[Topic]]):
+        if not self._doc_id:
+            return  # 文档创建失败，错误由 finish() 抛出
+        topic_blocks = _topic_blocks(topics)
+        if not self._fresh:
+            self._update_articles(date_range, topic_blocks, articles_by_account)
+            return
+        counts = {name: len(articles) for name, articles in articles_by_account.items()}
+        meta = _meta_blocks(counts, date_range)
+        blocks, tags = _account_blocks(articles_by_account)
+        tags = [("meta",)] * len(meta) + [("topics",)] * len(topic_blocks) + tags
+        self._write(meta + topic_blocks + blocks, -1, "文章块", tags)
+
+    def _update_articles(self, date_range: str, topic_blocks: list,
+                         articles_by_account: Dict[str, List[Article]]):
+        st = self._state
+        counts = st["counts"]
+        doc = self._doc_id
+        self._call(_update_text, doc, doc, [_text_elem(self.title)])
+
+        children = self._call(_list_children, doc)
+        pos = {block_id: i for i, block_id in enumerate(children)}
+        group_starts = sorted(pos[b] for b in st["groups"].values() if b in pos)
+
+        # 新文章插在账号标题之下（最新在前）；新账号插到所属板块末尾，新板块追加到文档末尾
+        inserts = []    # (位置, 块, 标记)
+        new_groups: Dict[str, tuple] = {}
+        new_heads = set()   # 本次新写标题的账号
+        added = 0
+        for account, articles in articles_by_account.items():
+            new = [a for a in articles if article_key(a.title, a.source) not in st["articles"]]
+            if not new:
+                continue
+            added += len(new)
+            blocks = [_article_bullet(a, _also(a)) for a in new]
+            tags = [("article", article_key(a.title, a.source), account) for a in new]
+            head = st["accounts"].get(account)
+            group = articles[0].group
+            if head in pos:
+                inserts.append((pos[head] + 1, blocks, tags))
+                continue
+            new_heads.add(account)
+            blocks.insert(0, _heading2_block(f"{account}（{len(new)}篇）"))
+            tags.insert(0, ("account", account, len(new)))
+            if st["groups"].get(group) in pos:
+                start = pos[st["groups"][group]]
+                end = next((i for i in group_starts if i > start), len(children))
+                inserts.append((end, blocks, tags))
+            elif group in new_groups:
+                new_groups[group][1].extend(blocks)
+                new_groups[group][2].extend(tags)
+            else:
+                new_groups[group] = (len(children), [_heading1_block(f"📂 {group}")] + blocks,
+                                     [("group", group)] + tags)
+                inserts.append(new_groups[group])
+
+        # 从后往前插入，前面的位置不受影响；同一位置按原顺序（后加的先插）
+        for _, (index, blocks, tags) in sorted(enumerate(inserts), key=lambda p: (p[1][0], p[0]),
+                                               reverse=True):
+            self._write(blocks, index, "新文章块", tags)
+        self._log.append(f"  ✓ 新增文章 {added} 篇")
+
+        # 账号标题与元信息按文档中实际写入的篇数原地更新（含上次中途失败后没来得及更新的标题）
+        shown = st.setdefault("shown", {})
+        for account, head in st["accounts"].items():
+            if (head in pos or account in new_heads) and shown.get(account) != counts.get(account, 0):
+                self._call(_update_text, doc, head,
+                           [_text_elem(f"{account}（{counts.get(account, 0)}篇）")])
+                shown[account] = counts.get(account, 0)
+        if st["meta"] and st["meta"][0] in pos:
+            meta = _meta_blocks(counts, date_range)
+            self._call(_update_text, doc, st["meta"][0], meta[0]["text"]["elements"])
+
+        # 「按主题」整体替换（位于各板块之前，不受上面插入的影响）
+        old = [b for b in st["topics"] if b in pos]
+        if old:
+            start = pos[old[0]]
+            self._call(_delete_range, doc, start, start + len(old))
+        else:
+            start = len(st["meta"]) + sum(1 for b in st["summary"] if b in pos)
+        st["topics"] = []
+        self._write(topic_blocks, start, "主题块", [("topics",)] * len(topic_blocks))
+
+    def finish(self, ai_summary: Optional[str]) -> str:
+        """写入 AI 摘要（如有，更新模式下替换旧摘要）并共享，等待所有写入完成，返回文档链接"""
+        if ai_summary:
+            self._pending.append(self._pool.submit(self._write_summary, ai_summary))
+        if self.config.feishu_share_openid:
+            self._pending.append(self._pool.submit(self._share))
+        try:
+            for fut in self._pending:
+                fut.result()
+        finally:
+            self._pool.shutdown(wait=True)
+            # 中途失败也保存：映射里只有实际写入的块，下次运行接着补齐，不会重复插入或另建文档
+            if self._update and self._doc_id:
+                self._state["updated"] = datetime.now().isoformat(timespec="seconds")
+                _save_doc_map(self.config.feishu_doc_map_path, self._key, self._state)
+            print("\n".join(self._log), flush=True)
+        return self.url
+
+    def _write_summary(self, ai_summary: str):
+        if not self._doc_id:
+            return
+        st = self._state
+        old = st["summary"]
+        if old:
+            pos = {b: i for i, b in enumerate(self._call(_list_children, self._doc_id))}
+            old = [b for b in old if b in pos]
+            if old:
+                self._call(_delete_range, self._doc_id, pos[old[0]], pos[old[0]] + len(old))
+        # AI 摘要紧跟元信息
+        blocks = _summary_blocks(ai_summary)
+        st["summary"] = []
+        self._write(blocks, len(st["meta"]), "摘要块", [("summary",)] * len(blocks))
+
+    def _share(self):
+        if not self._doc_id:
+            return
+        self._call(_share, self._doc_id, self.config.feishu_share_openid)
+        self._log.append(f"  ✓ 已共享给 {self.config.feishu_share_openid}")
+
+    def discard(self):
+        """不再写入（如没有爬到文章）：删除本次新建的空文档（更新模式下的已有文档保持不变）"""
+        self._pool.shutdown(wait=True)
+        if self._doc_id and self._fresh:
+            try:
+                self._call(_delete_doc, self._doc_id)
+            except Exception as e:
+                print(f"  ⚠ 删除空白飞书文档失败: {e}")
+
+
+# ─── 主输出函数 ──────────────────────────────────────────────────────────────
+
+def output(
+    articles_by_account: Dict[str, List[Article]],
+    ai_summary: Optional[str],
+    title: str,
+    date_range: str,
+    config,
+    topics: Optional[List[Topic]] = None,
+) -> str:
+    """输出到飞书文档，返回文档链接（一次性写入；流水线写法见 FeishuSink）"""
+    sink = FeishuSink(config, title)
+    sink.write_articles(articles_by_account, date_range, topics)
+    return sink.finish(ai_summary)
@@ -1,10 +1,16 @@
-"""本地文件输出：Markdown 报告 + JSON 原始数据"""
-import json
+"""本地文件输出：按日期分区的归档（见 archive），以及由它派生的 Markdown 报告与 JSON 原始数据
+
+每次运行在 LOCAL_OUTPUT_DIR/archive 下追加一个分段，历史不会被覆盖；
+{date}_digest.md 与 {date}_raw.json 是当天最近一次运行的视图，逐行写到临时文件后原子替换。
+"""
+import os
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional
 
+from .. import archive
 from ..crawler import Article
+from ..topics import OTHER_TOPIC, Topic
 
 
 def output(
@@ -13,6 +19,7 @@ def output(
     title: str,
     date_range: str,
     config,
+    topics: Optional[List[Topic]] = None,
 ) -> Path:
     """输出到本地目录，返回输出目录路径"""
 
@@ -23,10 +30,40 @@ def output(
     md_path   = out_dir / f"{today}_digest.md"
     json_path = out_dir / f"{today}_raw.json"
 
-    total = sum(len(v) for v in articles_by_account.values())
+    # ── 归档（只追加） ───────────────────────────────────────────────────────
+    segment = archive.write_run(config.archive_dir, articles_by_account, ai_summary,
+                                title, date_range, topics)
+    print(f"  ✓ 归档:     {segment}")
 
     # ── Markdown 报告 ────────────────────────────────────────────────────────
-    md_lines = [
+    tmp = md_path.with_name(f".{md_path.name}.tmp")
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            for line in _markdown_lines(articles_by_account, ai_summary, title, date_range, topics):
+                f.write(line + "\n")
+        os.replace(tmp, md_path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    print(f"  ✓ Markdown: {md_path}")
+
+    # ── JSON 原始数据（由归档分段导出） ─────────────────────────────────────
+    archive.write_raw_json(segment, json_path)
+    print(f"  ✓ JSON:     {json_path}")
+
+    return out_dir
+
+
+def _markdown_lines(
+    articles_by_account: Dict[str, List[Article]],
+    ai_summary: Optional[str],
+    title: str,
+    date_range: str,
+    topics: Optional[List[Topic]],
+):
+    """逐行生成 Markdown 报告"""
+    total = sum(len(v) for v in articles_by_account.values())
+    yield from [
         f"# {title}",
         "",
         f"> 爬取范围：{date_range}  ·  合计：{total} 篇",
@@ -39,7 +76,7 @@ def output(
 
     # AI 摘要
     if ai_summary:
-        md_lines += [
+        yield from [
             "## 📊 AI 智能摘要",
             "",
             ai_summary.strip(),
@@ -48,6 +85,18 @@ def output(
             "",
         ]
 
+    # 按主题（本地聚类，未归类的文章只在下方按账号列出）
+    clustered = [t for t in topics or [] if t.label != OTHER_TOPIC]
+    if clustered:
+        yield from ["## 🗂 按主题", ""]
+        for t in clustered:
+            yield from [f"### {t.label}（{len(t.articles)} 篇）", ""]
+            for a in t.articles:
+                title_md = f"[{a.title}]({a.url})" if a.url else a.title
+                yield f"- [{a.date}] {title_md} · {a.source}"
+            yield ""
+        yield from ["---", ""]
+
     # 各账号文章（按 group 分组）
     by_group: dict = {}
     for account, articles in articles_by_account.items():
@@ -55,38 +104,15 @@ def output(
         by_group.setdefault(g, {})[account] = articles
 
     for group_name, group_accounts in by_group.items():
-        md_lines += [f"## 📂 {group_name}", ""]
+        yield from [f"## 📂 {group_name}", ""]
         for account, articles in group_accounts.items():
-            md_lines += [f"### {account}（{len(articles)} 篇）", ""]
+            yield from [f"### {account}（{len(articles)} 篇）", ""]
             for a in articles:
+                also = f"（另见：{'、'.join(a.related)}）" if a.related else ""
                 if a.url:
-                    md_lines.append(f"- [{a.date}] [{a.title}]({a.url})")
+                    yield f"- [{a.date}] [{a.title}]({a.url}){also}"
                 else:
-                    md_lines.append(f"- [{a.date}] {a.title}")
+                    yield f"- [{a.date}] {a.title}{also}"
                 if a.summary:
-                    md_lines.append(f"  > {a.summary[:100]}")
-            md_lines.append("")
-
-    md_path.write_text("\n".join(md_lines), encoding="utf-8")
-    print(f"  ✓ Markdown: {md_path}")
-
-    # ── JSON 原始数据 ────────────────────────────────────────────────────────
-    raw = {
-        "meta": {
-            "title": title,
-            "date_range": date_range,
-            "generated_at": datetime.now().isoformat(),
-            "total": total,
-        },
-        "ai_summary": ai_summary,
-        "articles": {
-            account: [a.to_dict() for a in articles]
-            for account, articles in articles_by_account.items()
-        },
-    }
-    json_path.write_text(
-        json.dumps(raw, ensure_ascii=False, indent=2), encoding="utf-8"
-    )
-    print(f"  ✓ JSON:     {json_path}")
-
-    return out_dir
+                    yield f"  > {a.summary[:100]}"
+            yield ""
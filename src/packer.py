@@ -0,0 +1,110 @@
+"""Prompt 打包：估算 token 数，按预算挑选送给 AI 的文章
+
+挑选顺序：
+  1. 各板块轮流、板块内各账号轮流取文章，避免某个板块或账号挤占全部预算；
+  2. 账号内先取多家报道过的文章（去重后带 related），再按发布时间从新到旧；
+  3. 放不下的文章跳过并记入报告，后面更短的文章仍可继续放入。
+"""
+import re
+from collections import deque
+from typing import Callable, Dict, List, Tuple
+
+from .crawler import Article
+
+# CJK 统一表意文字、假名、韩文及全角标点：大致 1 字 1 token
+_CJK = re.compile(r"[\u3000-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：CJK 字符按 1 个、其余字符按 4 个 1 个计"""
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+class PackReport:
+    """打包结果统计：收录/舍弃的篇数与估算 token 数，以及舍弃了哪些文章"""
+
+    def __init__(self, budget: int):
+        self.budget = budget
+        self.tokens = 0
+        self.kept = 0
+        self.dropped: Dict[str, int] = {}   # 板块 → 舍弃篇数
+        self.dropped_articles: Dict[str, List[Article]] = {}   # 账号 → 舍弃的文章
+
+    @property
+    def total_dropped(self) -> int:
+        return sum(self.dropped.values())
+
+    def __str__(self) -> str:
+        text = (f"prompt 预算 {self.budget} tokens，收录 {self.kept} 篇"
+                f"（约 {self.tokens} tokens）")
+        if self.dropped:
+            detail = "、".join(f"{g} {n}" for g, n in self.dropped.items())
+            text += f"，超出预算舍弃 {self.total_dropped} 篇（{detail}）"
+        return text
+
+    def dropped_lines(self, limit: int = 30) -> List[str]:
+        """舍弃的文章，每篇一行「账号：[日期] 标题」；超过 limit 篇时只列前 limit 篇"""
+        lines = [f"{account}：[{a.date}] {a.title}"
+                 for account, articles in self.dropped_articles.items() for a in articles]
+        if len(lines) > limit:
+            lines[limit:] = [f"……另有 {len(lines) - limit} 篇"]
+        return lines
+
+
+def _priority(a: Article):
+    # 多家报道的事件优先，其次越新越优先
+    return (len(a.related), a.ts)
+
+
+def pack(
+    articles_by_account: Dict[str, List[Article]],
+    budget: int,
+    cost: Callable[[Article], int],
+) -> Tuple[Dict[str, List[Article]], PackReport]:
+    """在 budget 个 token 内挑选文章，返回 ({账号: 入选文章（保持原顺序）}, 报告)
+
+    cost(article) 为单篇文章在 prompt 里占的 token 数（含摘要行）；
+    每个账号、每个板块的标题行按 20 token 预留。
+    """
+    report = PackReport(budget)
+    header_cost = 20
+
+    # 板块 → 账号队列；每个账号的文章按优先级排好
+    groups: Dict[str, deque] = {}
+    for account, articles in articles_by_account.items():
+        if not articles:
+            continue
+        ranked = deque(sorted(articles, key=_priority, reverse=True))
+        groups.setdefault(articles[0].group or "其他", deque()).append((account, ranked))
+
+    chosen: Dict[str, set] = {}
+    chosen_groups: set = set()
+    used = 0
+    while groups:
+        for group_name in list(groups):
+            accounts = groups[group_name]
+            account, ranked = accounts.popleft()
+            a = ranked.popleft()
+            need = cost(a)
+            if account not in chosen:
+                need += header_cost
+            if group_name not in chosen_groups:
+                need += header_cost
+            if used + need <= budget:
+                used += need
+                chosen.setdefault(account, set()).add(id(a))
+                chosen_groups.add(group_name)
+                report.kept += 1
+            else:
+                report.dropped[group_name] = report.dropped.get(group_name, 0) + 1
+                report.dropped_articles.setdefault(account, []).append(a)
+            if ranked:
+                accounts.append((account, ranked))
+            if not accounts:
+                del groups[group_name]
+
+    report.tokens = used
+    packed = {account: [a for a in articles if id(a) in chosen.get(account, ())]
+              for account, articles in articles_by_account.items()}
+    return packed, report
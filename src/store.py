@@ -0,0 +1,81 @@
+"""本地文章库：SQLite 持久化已爬取的文章，支撑增量爬取"""
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, List, Set
+
+from .crawler import Article
+
+
+def article_key(title: str, source: str) -> str:
+    """文章唯一键：标题 + 来源（与 search_wechat.js 的 articleKey 保持一致）"""
+    return f"{title.strip()}\t{source.strip()}"
+
+
+class ArticleStore:
+    """按 (账号, 标题, 来源) 去重保存文章；线程安全"""
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS articles (
+                    account    TEXT NOT NULL,
+                    title      TEXT NOT NULL,
+                    source     TEXT NOT NULL,
+                    grp        TEXT NOT NULL DEFAULT '',
+                    url        TEXT NOT NULL DEFAULT '',
+                    summary    TEXT NOT NULL DEFAULT '',
+                    datetime   TEXT NOT NULL DEFAULT '',
+                    first_seen TEXT NOT NULL,
+                    PRIMARY KEY (account, title, source)
+                )""")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_articles_account_dt "
+                "ON articles (account, datetime)")
+
+    def known_keys(self, account: str) -> Set[str]:
+        """该账号已收录文章的唯一键集合"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT title, source FROM articles WHERE account = ?", (account,)
+            ).fetchall()
+        return {article_key(t, s) for t, s in rows}
+
+    def upsert(self, account: str, articles: Iterable[Article]) -> int:
+        """写入/更新文章，返回本次新增的条数"""
+        now = datetime.now().isoformat(timespec="seconds")
+        rows = [(account, a.title, a.source, a.group, a.url, a.summary, a.datetime, now)
+                for a in articles]
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany("""
+                INSERT INTO articles
+                    (account, title, source, grp, url, summary, datetime, first_seen)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (account, title, source) DO NOTHING""", rows)
+            inserted = self._conn.total_changes - before
+            # 已有记录只刷新可能变化的字段（如解析出的真实链接）
+            self._conn.executemany("""
+                UPDATE articles SET grp = ?, url = ?, summary = ?, datetime = ?
+                WHERE account = ? AND title = ? AND source = ?""",
+                [(g, u, s, dt, acc, t, src) for acc, t, src, g, u, s, dt, _ in rows])
+        return inserted
+
+    def load(self, account: str, since: str = "") -> List[Article]:
+        """读取账号在 since（YYYY-MM-DD）之后发布的文章，按时间倒序"""
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT title, url, summary, datetime, source, grp FROM articles
+                WHERE account = ? AND datetime >= ?
+                ORDER BY datetime DESC""", (account, since)).fetchall()
+        return [Article(title=t, url=u, summary=s, datetime=dt, source=src, group=g)
+                for t, u, s, dt, src, g in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
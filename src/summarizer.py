@@ -1,10 +1,20 @@
 """AI 聚合摘要：调用 OpenRouter API（OpenAI 兼容格式）"""
+import hashlib
 import json
-import urllib.error
-import urllib.request
-from typing import Dict, List, Optional
+import os
+import queue
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
 
+from . import httpclient
+from .config import DEFAULT_PROMPT_TOKENS
 from .crawler import Article
+from .packer import estimate_tokens, pack
+from .topics import OTHER_TOPIC, Topic
 
 OPENROUTER_BASE = "https://openrouter.ai/api/v1"
 
@@ -26,75 +36,538 @@ SUMMARIZE_PROMPT = """你是一名专业的 AI 产业分析师兼内容编辑。
 
 请输出周报摘要："""
 
+# map 阶段：文章按预算切成若干段，每段单独提炼要点
+MAP_PROMPT = """你是一名专业的 AI 产业分析师。以下是按板块或主题分组的微信公众号文章（第 {index}/{count} 部分），请提炼其中的关键事件。
 
-def _build_articles_text(articles_by_account: Dict[str, List[Article]]) -> str:
-    lines = []
-    # 按 group 分组展示，让 AI 更好地区分内容类型
-    by_group: dict = {}
+要求：
+1. 按板块输出，每个板块以「# 板块：名称」开头；每条要点一行，以「- 」开头，突出数字、公司和关键事件
+2. 多个来源报道的同一事件合并为一条
+3. 不要遗漏具体的发布、融资、上市等事件
+4. 只输出要点列表，不要开场白和总结
+
+---
+
+{articles_text}
+
+---
+
+请输出要点："""
+
+# reduce 阶段：把各部分要点合并成最终周报
+REDUCE_PROMPT = """你是一名专业的 AI 产业分析师兼内容编辑。以下是从多个微信公众号文章中分板块提炼出的要点，请去重合并、按主题聚合，输出一份简洁的周报摘要。
+
+要求：
+1. 分两大板块输出：「技术动态」和「投融资动态」
+2. 每个板块下按主题分小节（如：大模型进展、产品发布、行业动态、融资事件、IPO/上市等）
+3. 每条要点一行，突出数字和关键事件
+4. 语言简洁直接，避免模糊表述
+5. 最后输出「本周关键信号」1-3条（影响最大的判断）
+6. 输出格式为 Markdown
+
+---
+
+{partials_text}
+
+---
+
+请输出周报摘要："""
+
+SUMMARY_CHARS = 120     # 每篇文章摘要截取的字数
+TOPIC_SUMMARIES = 2     # 按主题组织时，每个主题只保留前几篇文章的摘要
+MAP_MAX_TOKENS = 800
+REDUCE_MAX_TOKENS = 1500
+
+
+def _article_lines(a: Article, origin: str = "", with_summary: bool = True) -> List[str]:
+    # 多家同时报道的事件附上其他来源，提示 AI 这是重点
+    also = f"（另见：{'、'.join(a.related)}）" if a.related else ""
+    origin = f"〔{origin}〕" if origin else ""
+    lines = [f"- [{a.date}] {origin}{a.title}{also}"]
+    if a.summary and with_summary:
+        lines.append(f"  摘要：{a.summary[:SUMMARY_CHARS]}")
+    return lines
+
+
+def _article_cost(a: Article) -> int:
+    return estimate_tokens("\n".join(_article_lines(a))) + 1
+
+
+def _account_blocks(articles_by_account: Dict[str, List[Article]]) -> Dict[str, List[List[str]]]:
+    """按 group 分组，每个账号一段文本行：{板块标题行: [[来源行, 文章行...], ...]}"""
+    by_group: Dict[str, List[List[str]]] = {}
     for account, articles in articles_by_account.items():
-        g = articles[0].group if articles else "其他"
-        by_group.setdefault(g, {})[account] = articles
-
-    for group_name, group_accounts in by_group.items():
-        lines.append(f"# 板块：{group_name}")
-        for account, articles in group_accounts.items():
-            lines.append(f"## 来源：{account}")
-            for a in articles[:12]:
-                lines.append(f"- [{a.date}] {a.title}")
-                if a.summary:
-                    lines.append(f"  摘要：{a.summary[:80]}")
+        if not articles:
+            continue
+        lines = [f"## 来源：{account}"]
+        for a in articles:
+            lines += _article_lines(a)
+        by_group.setdefault(f"# 板块：{articles[0].group or '其他'}", []).append(lines)
+    return by_group
+
+
+def _topic_blocks(
+    topics: List[Topic],
+    articles_by_account: Dict[str, List[Article]],
+) -> Dict[str, List[List[str]]]:
+    """按本地聚类的主题组织文章，每个主题一段文本行（结构同 _account_blocks）
+
+    来源与板块写在文章行内，省去逐账号的标题行；同一主题多是同一件事，
+    只保留前 TOPIC_SUMMARIES 篇（多家报道、较新的优先）的摘要。
+    只收录 articles_by_account 中的文章（即打包后入选的）。
+    """
+    account_of = {id(a): account for account, arts in articles_by_account.items() for a in arts}
+    blocks: List[List[str]] = []
+    for t in topics:
+        articles = sorted((a for a in t.articles if id(a) in account_of),
+                          key=lambda a: (len(a.related), a.ts), reverse=True)
+        if not articles:
+            continue
+        keep = len(articles) if t.label == OTHER_TOPIC else TOPIC_SUMMARIES
+        lines = [f"## 主题：{t.label}（{len(articles)} 篇）"]
+        for n, a in enumerate(articles):
+            origin = "·".join(x for x in (a.group, a.source or account_of[id(a)]) if x)
+            lines += _article_lines(a, origin, with_summary=n < keep)
+        blocks.append(lines)
+    return {"# 按主题（同一主题的多篇文章可合并为一条要点；〔〕内为板块·来源）": blocks} if blocks else {}
+
+
+def _build_articles_text(by_group: Dict[str, List[List[str]]]) -> str:
+    lines = []
+    # 按 group（或主题）分组展示，让 AI 更好地区分内容类型
+    for group_header, blocks in by_group.items():
+        lines.append(group_header)
+        for block in blocks:
+            lines += block
         lines.append("")
     return "\n".join(lines)
 
 
-def summarize(
-    articles_by_account: Dict[str, List[Article]],
-    api_key: str,
-    model: str = "step/step-3-5-flash-preview",
-) -> Optional[str]:
+def _chunk_articles(by_group: Dict[str, List[List[str]]], budget: int) -> List[str]:
+    """把各板块的账号段落依次装进不超过 budget 个 token 的若干段
+
+    除最后一段外每段都尽量装满；板块、账号被拆到下一段时重复其标题行。
     """
-    调用 OpenRouter AI 生成聚合摘要。
-    失败时返回 None（不影响主流程）。
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for group_header, blocks in by_group.items():
+        for block in blocks:
+            header, body = block[0], block[1:]
+            # 文章行与其摘要行绑在一起，拆分时不分开
+            items: List[List[str]] = []
+            for line in body:
+                if line.startswith("- ") or not items:
+                    items.append([line])
+                else:
+                    items[-1].append(line)
+            for item in items:
+                text = "\n".join(item)
+                heads = [h for h in (group_header, header) if h not in current]
+                cost = estimate_tokens(text) + 1 + sum(estimate_tokens(h) + 1 for h in heads)
+                if current and size + cost > budget:
+                    chunks.append("\n".join(current))
+                    current, size = [], 0
+                    heads = [group_header, header]
+                    cost = estimate_tokens(text) + 1 + sum(estimate_tokens(h) + 1 for h in heads)
+                current += heads
+                current.append(text)
+                size += cost
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+class SummaryCache:
+    """AI 摘要的磁盘缓存：以 模型 + 请求参数 + 完整 prompt 的哈希为键，一个键一个文件
+
+    超过 ttl 秒的条目视为过期；总大小超过 max_bytes 时按最近使用时间淘汰最旧的条目。
+    读写失败都只当作未命中，不影响主流程。
     """
-    if not api_key:
-        return None
 
-    total = sum(len(v) for v in articles_by_account.values())
-    if total == 0:
-        return None
+    def __init__(self, directory: Path, ttl: float = 7 * 86400, max_bytes: int = 20 << 20):
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def key(*parts) -> str:
+        h = hashlib.sha256()
+        for part in parts:
+            h.update(str(part).encode("utf-8"))
+            h.update(b"\0")
+        return h.hexdigest()
 
-    articles_text = _build_articles_text(articles_by_account)
-    prompt = SUMMARIZE_PROMPT.format(articles_text=articles_text)
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
 
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+            if time.time() - entry["created"] > self.ttl:
+                path.unlink()
+                return None
+            os.utime(path)  # 记录最近使用时间，淘汰时参考
+            return entry["summary"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def put(self, key: str, summary: str, model: str = ""):
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self._path(key)
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            tmp.write_text(json.dumps({"created": time.time(), "model": model,
+                                       "summary": summary}, ensure_ascii=False),
+                           encoding="utf-8")
+            os.replace(tmp, path)
+            self._evict()
+        except OSError as e:
+            print(f"  ⚠ 写入 AI 摘要缓存失败: {e}")
+
+    def _evict(self):
+        entries = []
+        for p in self.directory.glob("*.json"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        total = sum(size for _, size, _ in entries)
+        now = time.time()
+        for mtime, size, p in sorted(entries):
+            # mtime 不早于 created：超过 ttl 未被使用过的条目一定已过期
+            if total <= self.max_bytes and now - mtime <= self.ttl:
+                continue
+            try:
+                p.unlink()
+                total -= size
+            except OSError:
+                pass
+
+
+class StreamStalled(TimeoutError):
+    """流式响应在 stall_timeout 秒内没有新内容"""
+
+
+def _request(prompt: str, api_key: str, model: str, max_tokens: int) -> Tuple[str, bytes, Dict[str, str]]:
+    """(URL, 请求体, 请求头)"""
     payload = json.dumps({
         "model": model,
         "messages": [{"role": "user", "content": prompt}],
         "temperature": 0.3,
-        "max_tokens": 1500,
+        "max_tokens": max_tokens,
+        "stream": True,
     }, ensure_ascii=False).encode("utf-8")
 
     headers = {
         "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json",
+        "Accept": "text/event-stream",
         "HTTP-Referer": "https://github.com/your-org/wechat-feishu-digest",
         "X-Title": "wechat-feishu-digest",
     }
 
-    req = urllib.request.Request(
-        f"{OPENROUTER_BASE}/chat/completions",
-        data=payload,
-        headers=headers,
-        method="POST",
-    )
+    return f"{OPENROUTER_BASE}/chat/completions", payload, headers
 
+
+def _stream_once(prompt: str, api_key: str, model: str, max_tokens: int,
+                 timeout: float, stall_timeout: float) -> Iterator[str]:
+    url, payload, headers = _request(prompt, api_key, model, max_tokens)
+    deadline = time.monotonic() + timeout
     try:
-        with urllib.request.urlopen(req, timeout=60) as resp:
-            data = json.loads(resp.read().decode("utf-8"))
-        return data["choices"][0]["message"]["content"].strip()
-    except urllib.error.HTTPError as e:
-        body = e.read().decode("utf-8")[:300]
-        print(f"  ⚠ AI 摘要失败 (HTTP {e.code}): {body}")
+        # 429/5xx 由 httpclient 退避重试（只在收到响应头之前），HttpError 的信息为 "HTTP 状态码: 响应体"；
+        # 生成请求没有副作用，按幂等请求重发
+        resp = httpclient.default_client().stream("POST", url, payload, headers,
+                                                  timeout=stall_timeout, deadline=timeout,
+                                                  idempotent=True)
+    except socket.timeout:
+        raise StreamStalled(f"{stall_timeout:.0f}s 内未收到响应") from None
+
+    with resp:
+        lines = iter(resp)
+        last = time.monotonic()
+        while True:
+            try:
+                raw = next(lines)
+            except StopIteration:
+                return
+            except socket.timeout:
+                raise StreamStalled(f"{stall_timeout:.0f}s 内没有新内容") from None
+            now = time.monotonic()
+            if now > deadline:
+                raise TimeoutError(f"AI 响应超时（{timeout:.0f}s）")
+
+            line = raw.decode("utf-8").strip()
+            delta = None
+            if line.startswith("data:"):
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    return
+                chunk = json.loads(data)
+                if "error" in chunk:
+                    err = chunk["error"]
+                    raise RuntimeError(err.get("message", err) if isinstance(err, dict) else err)
+                choices = chunk.get("choices") or [{}]
+                delta = (choices[0].get("delta") or {}).get("content")
+            # 空行是事件分隔，冒号开头的是保活注释（": OPENROUTER PROCESSING"），都不算进展
+            if delta:
+                last = now
+                yield delta
+            elif now - last > stall_timeout:
+                raise StreamStalled(f"{stall_timeout:.0f}s 内没有新内容")
+
+
+def stream_chat(
+    prompt: str,
+    api_key: str,
+    model: str,
+    max_tokens: int = REDUCE_MAX_TOKENS,
+    timeout: float = 60,
+    stall_timeout: float = 15,
+    retries: int = 1,
+) -> Iterator[str]:
+    """以 stream 模式请求 OpenRouter，解析 SSE，逐段产出回复增量
+
+    stall_timeout 秒内没有新内容视为卡住：还没产出任何内容时立即重试（最多 retries 次），
+    已经产出部分内容时抛 StreamStalled。整个请求超过 timeout 秒抛 TimeoutError。
+    """
+    for attempt in range(retries + 1):
+        emitted = False
+        try:
+            for delta in _stream_once(prompt, api_key, model, max_tokens, timeout, stall_timeout):
+                emitted = True
+                yield delta
+            return
+        except StreamStalled as e:
+            if emitted or attempt == retries:
+                raise
+            print(f"  ⚠ AI 响应停滞（{e}），重试", flush=True)
+
+
+def chat_models(
+    prompt: str,
+    api_key: str,
+    models: Sequence[str],
+    max_tokens: int = REDUCE_MAX_TOKENS,
+    timeout: float = 60,
+    stall_timeout: float = 15,
+    hedge_delay: float = 0,
+) -> Iterator[Tuple[str, str]]:
+    """按 models 顺序降级请求，逐段产出 (回复的模型, 回复增量)
+
+    一个模型失败（或空回复）且还没产出内容时换下一个；全部失败抛出最后一个错误。
+    hedge_delay > 0 时对冲：当前模型 hedge_delay 秒内还没开始输出，就同时请求下一个，
+    先产出内容的胜出，其余请求取消（各自的连接在收到下一行或停滞超时后关闭）。
+    胜出的模型中途失败时直接抛出，不再降级（已产出的内容无法撤回）。
+    """
+    if len(models) == 1:
+        for delta in stream_chat(prompt, api_key, models[0], max_tokens, timeout, stall_timeout):
+            yield models[0], delta
+        return
+
+    events: "queue.Queue[Tuple[int, str, object]]" = queue.Queue()
+    cancels: List[threading.Event] = []
+
+    def run(idx: int, cancel: threading.Event):
+        stream = stream_chat(prompt, api_key, models[idx], max_tokens, timeout, stall_timeout)
+        try:
+            for delta in stream:
+                if cancel.is_set():
+                    return
+                events.put((idx, "delta", delta))
+            events.put((idx, "done", None))
+        except Exception as e:
+            events.put((idx, "error", e))
+        finally:
+            stream.close()
+
+    def start():
+        cancel = threading.Event()
+        cancels.append(cancel)
+        threading.Thread(target=run, args=(len(cancels) - 1, cancel), daemon=True).start()
+
+    start()
+    running = 1
+    winner: Optional[int] = None
+    error: Exception = RuntimeError("没有可用的模型")
+    hedge_at = time.monotonic() + hedge_delay
+    try:
+        while True:
+            wait = None
+            if winner is None and hedge_delay > 0 and len(cancels) < len(models):
+                wait = max(0.0, hedge_at - time.monotonic())
+            try:
+                idx, kind, value = events.get(timeout=wait)
+            except queue.Empty:
+                print(f"  ↪ {models[len(cancels) - 1]} {hedge_delay:g}s 内未响应，"
+                      f"同时请求 {models[len(cancels)]}", flush=True)
+                start()
+                running += 1
+                hedge_at = time.monotonic() + hedge_delay
+                continue
+
+            if winner is not None:
+                if idx != winner:
+                    continue
+                if kind == "delta":
+                    yield models[idx], value
+                elif kind == "done":
+                    return
+                else:
+                    raise value
+                continue
+
+            if kind == "delta":
+                winner = idx
+                for i, cancel in enumerate(cancels):
+                    if i != idx:
+                        cancel.set()
+                if idx:
+                    print(f"  ✓ 采用 {models[idx]} 的回复", flush=True)
+                yield models[idx], value
+                continue
+
+            # 尚无胜出者时某个请求结束：失败或空回复，换下一个模型（如还有）
+            running -= 1
+            error = value if kind == "error" else RuntimeError("空回复")
+            print(f"  ⚠ 模型 {models[idx]} 失败: {error}", flush=True)
+            if running == 0:
+                if len(cancels) == len(models):
+                    raise error
+                print(f"  ↪ 改用 {models[len(cancels)]}", flush=True)
+                start()
+                running += 1
+                hedge_at = time.monotonic() + hedge_delay
+    finally:
+        for cancel in cancels:
+            cancel.set()
+
+
+def _cached_chat(prompt: str, api_key: str, models: Sequence[str], max_tokens: int,
+                 timeout: float, stall_timeout: float, hedge_delay: float,
+                 cache: Optional[SummaryCache], refresh: bool,
+                 on_delta: Optional[Callable[[str], None]] = None) -> Tuple[str, bool]:
+    """带缓存的流式请求，返回 (完整回复, 是否命中缓存)；on_delta 逐段接收回复（命中缓存时一次给出）
+
+    缓存按模型分别存放：依次查找 models 中各模型的缓存，新结果记在实际回复的模型名下。
+    """
+    if cache is not None and not refresh:
+        for model in models:
+            cached = cache.get(SummaryCache.key(model, max_tokens, prompt))
+            if cached:
+                if on_delta:
+                    on_delta(cached)
+                return cached, True
+    parts = []
+    answered = models[0]
+    for answered, delta in chat_models(prompt, api_key, models, max_tokens, timeout,
+                                       stall_timeout, hedge_delay):
+        parts.append(delta)
+        if on_delta:
+            on_delta(delta)
+    result = "".join(parts).strip()
+    if cache is not None and result:
+        cache.put(SummaryCache.key(answered, max_tokens, prompt), result, answered)
+    return result, False
+
+
+def _finish(result: Tuple[str, bool]) -> str:
+    summary, hit = result
+    if hit:
+        print("  （命中缓存）", flush=True)
+    return summary
+
+
+def summarize(
+    articles_by_account: Dict[str, List[Article]],
+    api_key: str,
+    model: str = "step/step-3-5-flash-preview",
+    fallbacks: Sequence[str] = (),
+    cache: Optional[SummaryCache] = None,
+    refresh: bool = False,
+    prompt_tokens: int = DEFAULT_PROMPT_TOKENS,
+    max_chunks: int = 8,
+    concurrency: int = 4,
+    timeout: float = 60,
+    stall_timeout: float = 15,
+    on_delta: Optional[Callable[[str], None]] = None,
+    topics: Optional[List[Topic]] = None,
+    hedge_delay: float = 0,
+) -> Optional[str]:
+    """
+    调用 OpenRouter AI 生成聚合摘要。
+    失败时返回 None（不影响主流程）。
+
+    prompt_tokens 为单次请求的 prompt 预算（token，通常传 Config.ai_prompt_tokens），
+    送入的文章总量不超过 max_chunks 个请求的预算，超出时按优先级挑选（见 packer.pack）。
+    文章文本放得进一个请求时一次完成；否则走 map-reduce：
+    按预算切段（各段保留板块标题）并发提炼要点，同时在途的请求不超过 concurrency 个，
+    再用一次请求合并成周报。部分段失败时用其余段的要点继续合并。
+    每个请求的超时为 timeout 秒，总耗时取决于最慢的一段而非文章总量。
+    所有请求都以流式接收，stall_timeout 秒没有新内容即提前重试（见 stream_chat）；
+    model 失败时依次改用 fallbacks 中的模型，hedge_delay > 0 时超时未响应即并发请求下一个
+    （见 chat_models）；
+    on_delta 逐段接收最终摘要（单次请求或 reduce）的内容，用于边生成边显示。
+    传入 topics（见 topics.cluster）时按主题而非逐账号组织文章，同一主题只保留少数摘要，
+    prompt 更紧凑。
+    传入 cache 时，输入完全相同的请求直接返回缓存结果（map 各段也分别缓存）；
+    refresh=True 时忽略缓存重新生成。
+    """
+    if not api_key:
+        return None
+
+    total = sum(len(v) for v in articles_by_account.values())
+    if total == 0:
         return None
+
+    models = [model, *(m for m in fallbacks if m != model)]
+    budget = max(prompt_tokens - estimate_tokens(SUMMARIZE_PROMPT), 500)
+    # 每段末尾可能留下一篇放不下的空隙，总预算按每段少 250 token 计，保证段数不超过 max_chunks
+    total_budget = budget if max_chunks <= 1 else (budget - 250) * max_chunks
+    packed, report = pack(articles_by_account, total_budget, _article_cost)
+    print(f"  {report}", flush=True)
+    for line in report.dropped_lines():
+        print(f"    - {line}", flush=True)
+    articles_by_account = packed
+
+    by_group = (_topic_blocks(topics, articles_by_account) if topics
+                else _account_blocks(articles_by_account))
+    articles_text = _build_articles_text(by_group)
+    try:
+        if estimate_tokens(articles_text) <= budget:
+            prompt = SUMMARIZE_PROMPT.format(articles_text=articles_text)
+            return _finish(_cached_chat(prompt, api_key, models, REDUCE_MAX_TOKENS, timeout,
+                                        stall_timeout, hedge_delay, cache, refresh, on_delta))
+
+        # ── map：各段并发提炼要点 ──────────────────────────────────────────
+        chunks = _chunk_articles(by_group, budget)
+        count = len(chunks)
+        prompts = [MAP_PROMPT.format(index=i, count=count, articles_text=text)
+                   for i, text in enumerate(chunks, 1)]
+        print(f"  分 {count} 段并发提炼要点...", flush=True)
+
+        partials: List[Optional[str]] = [None] * count
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            futures = {pool.submit(_cached_chat, prompt, api_key, models, MAP_MAX_TOKENS,
+                                   timeout, stall_timeout, hedge_delay, cache, refresh): n
+                       for n, prompt in enumerate(prompts)}
+            for fut in as_completed(futures):
+                n = futures[fut]
+                try:
+                    partials[n], _ = fut.result()
+                except Exception as e:
+                    print(f"  ⚠ AI 提炼失败 [第 {n + 1}/{count} 段]: {e}", flush=True)
+
+        sections = [f"# 第 {n}/{count} 部分\n{partial}"
+                    for n, partial in enumerate(partials, 1) if partial]
+        if not sections:
+            return None
+
+        # ── reduce：合并成最终周报 ─────────────────────────────────────────
+        prompt = REDUCE_PROMPT.format(partials_text="\n\n".join(sections))
+        return _finish(_cached_chat(prompt, api_key, models, REDUCE_MAX_TOKENS, timeout,
+                                    stall_timeout, hedge_delay, cache, refresh, on_delta))
     except Exception as e:
         print(f"  ⚠ AI 摘要失败: {e}")
         return None
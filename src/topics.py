@@ -0,0 +1,262 @@
+"""本地主题预聚类：字符 n-gram TF-IDF + leader 聚类 / 球面 k-means
+
+把 标题 + 摘要 切成字符 2/3-gram（英文按整词），哈希到固定维度后做 TF-IDF
+（次线性 tf、L2 归一化）。先按余弦相似度阈值做一遍 leader 聚类确定主题数，
+再做几轮球面 k-means 修正。装了 NumPy 时用矩阵运算，否则退回纯 Python 稀疏实现；
+两者步骤相同、都用双精度，分组与标签一致（只有相似度恰好落在比较边界上时可能因浮点舍入不同）。
+聚类结果供 AI 摘要按主题组织输入，也用于本地 / 飞书输出中的「按主题」部分。
+"""
+import math
+import re
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from .crawler import Article
+
+try:
+    import numpy as _np
+except ImportError:  # NumPy 可选
+    _np = None
+
+_DIMS = 1 << 12          # 特征哈希维度
+_REFINE_ITER = 3
+_CHUNK = 256             # NumPy 实现中一次展开成稠密矩阵的文章数
+# 英文/数字整词，或一段连续的非 ASCII 文字
+_SEGMENT = re.compile(r"[A-Za-z0-9][A-Za-z0-9.+-]*[A-Za-z0-9]|[A-Za-z0-9]|[^\W\dA-Za-z_]+")
+_Vec = Dict[int, float]  # 稀疏向量：特征下标 → 权重
+OTHER_TOPIC = "其他"      # 未能归入任何主题的文章
+
+
+class Topic:
+    """一个主题簇：标签（高权重的 n-gram）与文章（最新在前）"""
+
+    __slots__ = ("label", "articles")
+
+    def __init__(self, label: str, articles: List[Article]):
+        self.label = label
+        self.articles = articles
+
+    def __repr__(self) -> str:
+        return f"Topic({self.label!r}, {len(self.articles)} 篇)"
+
+
+def _terms(text: str) -> List[Tuple[str, str]]:
+    """(特征词, 原文写法)：英文/数字按整词，中日韩文字按 2/3 字切分，不跨越标点空白"""
+    terms = []
+    for seg in _SEGMENT.findall(text):
+        key = seg.lower()
+        if seg.isascii():
+            terms.append((key, seg))
+        elif len(seg) < 2:
+            terms.append((key, seg))
+        else:
+            terms += [(key[i:i + n], seg[i:i + n])
+                      for n in (2, 3) for i in range(len(seg) - n + 1)]
+    return terms
+
+
+def _vectorize(articles: List[Article]) -> Tuple[List[_Vec], Dict[int, str]]:
+    """TF-IDF 稀疏向量（已 L2 归一化），以及特征下标 → 代表词（用于生成标签）"""
+    counts: List[Dict[int, int]] = []
+    names: Dict[int, str] = {}
+    df: Dict[int, int] = {}
+    for a in articles:
+        tf: Dict[int, int] = {}
+        # 标题计两次，权重高于摘要
+        for key, word in _terms(a.title) * 2 + _terms(a.summary):
+            idx = zlib.crc32(key.encode("utf-8")) % _DIMS
+            tf[idx] = tf.get(idx, 0) + 1
+            names.setdefault(idx, word)
+        for idx in tf:
+            df[idx] = df.get(idx, 0) + 1
+        counts.append(tf)
+
+    n = len(articles)
+    idf = {idx: math.log((1 + n) / (1 + d)) + 1 for idx, d in df.items()}
+    vectors: List[_Vec] = []
+    for tf in counts:
+        vec = {idx: (1 + math.log(c)) * idf[idx] for idx, c in tf.items()}
+        norm = math.sqrt(sum(w * w for w in vec.values())) or 1.0
+        vectors.append({idx: w / norm for idx, w in vec.items()})
+    return vectors, names
+
+
+def _dot(a: _Vec, b: _Vec) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(w * b.get(idx, 0.0) for idx, w in a.items())
+
+
+def _normalize(v: _Vec) -> _Vec:
+    norm = math.sqrt(sum(w * w for w in v.values()))
+    return {idx: w / norm for idx, w in v.items()} if norm else v
+
+
+def _cluster_python(vectors: List[_Vec], order: List[int],
+                    threshold: float) -> Tuple[List[int], List[_Vec]]:
+    # 1) leader 聚类：依次把文章并入最相近且相似度达到阈值的簇，否则新开一簇
+    sums: List[_Vec] = []
+    centroids: List[_Vec] = []
+    assign = [0] * len(vectors)
+    for i in order:
+        v = vectors[i]
+        sims = [_dot(v, c) for c in centroids]
+        best = max(range(len(sims)), key=sims.__getitem__, default=-1)
+        if best < 0 or sims[best] < threshold:
+            best = len(centroids)
+            sums.append({})
+            centroids.append(v)
+        s = sums[best]
+        for idx, w in v.items():
+            s[idx] = s.get(idx, 0.0) + w
+        centroids[best] = _normalize(s)
+        assign[i] = best
+
+    # 2) 以 leader 结果为初值做几轮球面 k-means，修正先后顺序造成的偏差
+    for _ in range(_REFINE_ITER):
+        new = [max(range(len(centroids)), key=lambda j: _dot(v, centroids[j])) for v in vectors]
+        if new == assign:
+            break
+        assign = new
+        sums = [{} for _ in centroids]
+        for i, v in enumerate(vectors):
+            s = sums[assign[i]]
+            for idx, w in v.items():
+                s[idx] = s.get(idx, 0.0) + w
+        centroids = [_normalize(s) if s else c for s, c in zip(sums, centroids)]
+    return assign, centroids
+
+
+def _dense(vectors: List[_Vec], rows: range):
+    """把 rows 这几篇文章的稀疏向量展开成稠密矩阵（只在分块计算时临时使用）"""
+    x = _np.zeros((len(rows), _DIMS))
+    for r, i in enumerate(rows):
+        x[r, list(vectors[i])] = list(vectors[i].values())
+    return x
+
+
+def _cluster_numpy(vectors: List[_Vec], order: List[int],
+                   threshold: float) -> Tuple[List[int], List[_Vec]]:
+    # 文章向量保持稀疏（下标 + 权重），中心矩阵只按主题数分配、按需倍增，
+    # 内存随主题数而不是文章数增长；k-means 修正时分块展开成稠密矩阵
+    idx = [_np.fromiter(v, dtype=_np.int64, count=len(v)) for v in vectors]
+    val = [_np.fromiter(v.values(), dtype=_np.float64, count=len(v)) for v in vectors]
+
+    sums = _np.zeros((16, _DIMS))
+    centroids = _np.zeros_like(sums)
+    k = 0
+    assign = _np.zeros(len(vectors), dtype=_np.int64)
+    for i in order:
+        sims = centroids[:k, idx[i]] @ val[i]
+        best = int(sims.argmax()) if k else -1
+        if best < 0 or sims[best] < threshold:
+            best, k = k, k + 1
+            if k > len(sums):
+                sums = _np.concatenate([sums, _np.zeros_like(sums)])
+                centroids = _np.concatenate([centroids, _np.zeros_like(centroids)])
+        sums[best, idx[i]] += val[i]
+        centroids[best] = sums[best] / _np.linalg.norm(sums[best])
+        assign[i] = best
+    centroids = centroids[:k].copy()
+    del sums
+
+    for _ in range(_REFINE_ITER):
+        new = _np.empty_like(assign)
+        totals = _np.zeros_like(centroids)
+        for lo in range(0, len(vectors), _CHUNK):
+            rows = range(lo, min(lo + _CHUNK, len(vectors)))
+            x = _dense(vectors, rows)
+            new[lo:rows.stop] = (x @ centroids.T).argmax(axis=1)
+            members = new[lo:rows.stop] == _np.arange(len(centroids))[:, None]
+            totals += members @ x
+        if (new == assign).all():
+            break
+        assign = new
+        norms = _np.linalg.norm(totals, axis=1)
+        keep = norms > 0  # 空簇保留原中心
+        centroids[keep] = totals[keep] / norms[keep, None]
+    sparse = [{int(j): float(c[j]) for j in _np.flatnonzero(c)} for c in centroids]
+    return assign.tolist(), sparse
+
+
+def _join(a: str, b: str) -> str:
+    """a 的结尾与 b 的开头重叠一个字以上（或反之）时返回拼接结果，否则返回空串"""
+    if a.isascii() or b.isascii():
+        return ""
+    for k in range(min(len(a), len(b)) - 1, 0, -1):
+        if a.endswith(b[:k]):
+            return a + b[k:]
+        if b.endswith(a[:k]):
+            return b + a[k:]
+    return ""
+
+
+def _label(centroid: _Vec, names: Dict[int, str], size: int = 3) -> str:
+    """取中心权重最高的几个 n-gram 作标签；相互重叠的合成一个词（「英伟」「伟达」→「英伟达」）"""
+    picked: List[str] = []
+    weights: Dict[str, float] = {}
+    # 权重相同的按词排序（权重舍入到 6 位），标签不随稀疏向量的键顺序和浮点误差变化
+    ranked = sorted(centroid.items(), key=lambda kv: (-round(kv[1], 6), names.get(kv[0], "")))
+    for idx, w in ranked[:size * 4]:
+        term = names.get(idx, "")
+        if not term or any(term in p for p in picked):
+            continue
+        # 与已选词首尾重叠的中文 n-gram（「机器之」「器之心」）拼成一个词
+        joined = next((j for j in (_join(p, term) for p in picked) if j), "")
+        if joined:
+            term = joined
+        covered = [p for p in picked if p in term]
+        if covered:
+            # 权重相当才替换/拼接，避免「芯片」被偶然出现的「芯片性」顶掉
+            if w < 0.8 * max(weights[p] for p in covered):
+                continue
+            at = picked.index(covered[0])
+            picked = [p for p in picked if p not in covered]
+            picked.insert(at, term)
+        elif len(picked) < size:
+            picked.append(term)
+        weights[term] = w
+    return " / ".join(picked)
+
+
+def cluster(
+    articles_by_account: Dict[str, List[Article]],
+    threshold: float = 0.1,
+    use_numpy: Optional[bool] = None,
+) -> List[Topic]:
+    """把所有账号的文章聚成主题，按文章数从多到少返回
+
+    与主题中心的余弦相似度不低于 threshold 的文章归入该主题，主题数随之确定；
+    只有一篇文章的主题合并到最后的「其他」。use_numpy 为 None 时有 NumPy 就用。
+    """
+    articles = [a for arts in articles_by_account.values() for a in arts]
+    if not articles:
+        return []
+
+    vectors, names = _vectorize(articles)
+    # 多家报道、较新的文章先处理，更可能成为主题的核心
+    order = sorted(range(len(articles)),
+                   key=lambda i: (len(articles[i].related), articles[i].ts), reverse=True)
+    if use_numpy is None:
+        use_numpy = _np is not None
+    run = _cluster_numpy if use_numpy else _cluster_python
+    assign, centroids = run(vectors, order, threshold)
+
+    members: Dict[int, List[Article]] = {}
+    for a, c in zip(articles, assign):
+        members.setdefault(c, []).append(a)
+
+    topics: List[Topic] = []
+    others: List[Article] = []
+    for c, arts in members.items():
+        if len(arts) == 1:
+            others += arts
+        else:
+            topics.append(Topic(_label(centroids[c], names), arts))
+    if others:
+        topics.append(Topic(OTHER_TOPIC, others))
+    for t in topics:
+        t.articles.sort(key=lambda a: a.ts, reverse=True)
+    topics.sort(key=lambda t: (t.label != OTHER_TOPIC, len(t.articles), t.articles[0].ts),
+                reverse=True)
+    return topics
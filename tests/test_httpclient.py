@@ -0,0 +1,96 @@
+"""httpclient 的重试规则：幂等请求遇 5xx 重试，非幂等请求只在 429 时重试；连接按主机复用"""
+import sys
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src import httpclient  # noqa: E402
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """按 server.plan 依次回复状态码（用完后回 200），并记下每个请求"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        server = self.server
+        with server.lock:
+            server.hits.append((self.command, self.client_address))
+            status, headers = server.plan.pop(0) if server.plan else (200, {})
+        body = b"ok"
+        self.send_response(status)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = _reply
+
+
+class RetryPolicyTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.lock = threading.Lock()
+        self.server.plan = []
+        self.server.hits = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/x"
+        self.client = httpclient.HttpClient(retries=3, backoff=0.01)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _plan(self, *steps):
+        self.server.plan[:] = [s if isinstance(s, tuple) else (s, {}) for s in steps]
+
+    def test_get_retried_on_503(self):
+        self._plan(503, 503)
+        resp = self.client.request("GET", self.url)
+        self.assertEqual(resp.status, 200)
+        self.assertEqual(len(self.server.hits), 3)
+
+    def test_post_not_retried_on_503(self):
+        # 服务端可能已执行了写入，重发会重复创建
+        self._plan(503)
+        with self.assertRaises(httpclient.HttpError) as cm:
+            self.client.request("POST", self.url, b"{}")
+        self.assertEqual(cm.exception.status, 503)
+        self.assertEqual(len(self.server.hits), 1)
+
+    def test_post_retried_on_503_when_idempotent(self):
+        self._plan(503)
+        resp = self.client.request("POST", self.url, b"{}", idempotent=True)
+        self.assertEqual(resp.status, 200)
+        self.assertEqual(len(self.server.hits), 2)
+
+    def test_post_retried_on_429_after_retry_after(self):
+        self._plan((429, {"Retry-After": "0.3"}))
+        started = time.monotonic()
+        resp = self.client.request("POST", self.url, b"{}")
+        self.assertEqual(resp.status, 200)
+        self.assertEqual(len(self.server.hits), 2)
+        self.assertGreaterEqual(time.monotonic() - started, 0.3)
+
+    def test_connection_reused(self):
+        for _ in range(3):
+            self.client.request("GET", self.url)
+        self.client.request("POST", self.url, b"{}")
+        # 同一条 keep-alive 连接：服务端看到的客户端端口始终相同
+        self.assertEqual(len({addr for _, addr in self.server.hits}), 1)
+        self.assertEqual(len(self.server.hits), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
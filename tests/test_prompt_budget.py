@@ -0,0 +1,85 @@
+"""默认配置下的 prompt 预算：文章多到超出预算时确实走分段提炼，并按优先级舍弃文章"""
+import contextlib
+import io
+import os
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src import summarizer  # noqa: E402
+from src.config import Config  # noqa: E402
+from src.crawler import Article  # noqa: E402
+from src.packer import estimate_tokens  # noqa: E402
+
+
+def _articles(accounts: int, per_account: int):
+    """带真实长度摘要的文章（搜狗返回的摘要通常 60~80 字）"""
+    result = {}
+    for i in range(accounts):
+        name = f"账号{i}"
+        result[name] = [
+            Article(
+                title=f"{name} 第{j}篇：大模型推理成本下降与国产芯片适配进展",
+                url=f"https://mp.weixin.qq.com/s/{i}-{j}",
+                summary="本文介绍了最新发布的开源大模型在推理效率、长上下文与工具调用方面的改进，"
+                        "并对比了多家厂商的定价策略，讨论国产算力适配与行业落地的前景。",
+                datetime=f"2026-10-{10 + j % 7:02d} {j % 24:02d}:00:00",
+                source=name,
+                group="科技媒体" if i % 2 else "投资资讯",
+            )
+            for j in range(per_account)
+        ]
+    return result
+
+
+class DefaultBudgetTest(unittest.TestCase):
+    def setUp(self):
+        with mock.patch.dict(os.environ, {}, clear=True):
+            self.config = Config("/nonexistent/.env")
+        self.prompts = []
+
+    def _fake_chat(self, prompt, *args, **kwargs):
+        self.prompts.append(prompt)
+        return "- 要点", False
+
+    def _summarize(self, articles):
+        out = io.StringIO()
+        with mock.patch.object(summarizer, "_cached_chat", self._fake_chat), \
+                contextlib.redirect_stdout(out):
+            summary = summarizer.summarize(
+                articles, "sk-test", self.config.openrouter_model,
+                prompt_tokens=self.config.ai_prompt_tokens,
+                max_chunks=self.config.ai_max_chunks,
+                concurrency=1,
+            )
+        return summary, out.getvalue()
+
+    def test_default_budget_is_capped(self):
+        # 默认模型上下文有 64k，预算仍应是周报量级，而不是按上下文推算出的几万 token
+        self.assertLessEqual(self.config.ai_prompt_tokens, 8000)
+
+    def test_typical_digest_fits_one_request(self):
+        summary, log = self._summarize(_articles(accounts=7, per_account=8))
+        self.assertEqual(summary, "- 要点")
+        self.assertEqual(len(self.prompts), 1)
+        self.assertNotIn("舍弃", log)
+
+    def test_large_digest_reaches_packing_limit(self):
+        summary, log = self._summarize(_articles(accounts=12, per_account=60))
+        self.assertEqual(summary, "- 要点")
+        # 超出 max_chunks 段的文章按优先级舍弃
+        self.assertIn("超出预算舍弃", log)
+        # 舍弃的文章逐篇列出（超出条数上限的只给总数）
+        self.assertRegex(log, r"\n    - 账号\d+：\[2026-10-\d\d\] 账号\d+ 第\d+篇")
+        self.assertIn("……另有", log)
+        # map 段数用满，再加一次 reduce；每段都在单次请求的预算内
+        self.assertEqual(len(self.prompts), self.config.ai_max_chunks + 1)
+        for prompt in self.prompts[:-1]:
+            self.assertLessEqual(estimate_tokens(prompt), self.config.ai_prompt_tokens)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -80,6 +80,9 @@ def write_env(data: dict) -> None:
 
 # ─── 运行状态管理 ─────────────────────────────────────────────────────────────
 
+# 与 run.py 的 UI_EVENT_PREFIX 一致
+UI_EVENT_PREFIX = "\x1e"
+
 run_lock   = threading.Lock()
 run_queue: queue.Queue = queue.Queue()
 is_running = False
@@ -89,7 +92,7 @@ def _do_run(extra_args: list):
     global is_running
     # frozen 模式下 run.py 在 _MEIPASS（静态资源目录）
     run_script = _frozen_assets() / "run.py"
-    cmd = [sys.executable, str(run_script)] + extra_args
+    cmd = [sys.executable, str(run_script), "--ui-events"] + extra_args
     try:
         proc = subprocess.Popen(
             cmd,
@@ -97,9 +100,20 @@ def _do_run(extra_args: list):
             stdout=subprocess.PIPE,
             stderr=subprocess.STDOUT,
             text=True,
+            encoding="utf-8",
+            errors="replace",
             bufsize=1,
+            # 子进程输出到管道时默认整块缓冲，关掉以便日志实时显示
+            env={**os.environ, "PYTHONUNBUFFERED": "1", "PYTHONIOENCODING": "utf-8"},
         )
         for line in proc.stdout:
+            if line.startswith(UI_EVENT_PREFIX):
+                # run.py 的事件行（如 AI 摘要的流式增量），原样转发
+                try:
+                    run_queue.put(json.loads(line[len(UI_EVENT_PREFIX):]))
+                    continue
+                except ValueError:
+                    pass
             run_queue.put({"type": "log", "text": line.rstrip()})
         proc.wait()
         status = "done" if proc.returncode == 0 else "error"
@@ -267,6 +281,8 @@ class Handler(BaseHTTPRequestHandler):
                     extra += ["--days", str(data["days"])]
                 if data.get("no_ai"):
                     extra.append("--no-ai")
+                if data.get("refresh_ai"):
+                    extra.append("--refresh-ai")
                 if data.get("dry_run"):
                     extra.append("--dry-run")
                 if start_run(extra):
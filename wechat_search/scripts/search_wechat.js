@@ -5,7 +5,9 @@
  * 通过搜狗微信搜索获取微信公众号文章
  */
 
+const fs = require('fs');
 const https = require('https');
+const path = require('path');
 const cheerio = require('cheerio');
 const zlib = require('zlib');
 
@@ -45,6 +47,24 @@ const HEADERS = {
   'Referer': 'https://weixin.sogou.com/',
 };
 
+// 全局 keep-alive 连接池：翻页、cookie 握手、跳转解析都复用到 sogou.com 的 TLS 连接
+const DEFAULT_MAX_SOCKETS = 8;
+let httpsAgent = new https.Agent({ keepAlive: true, maxSockets: DEFAULT_MAX_SOCKETS });
+
+// 连接复用统计（进程内累计），随结果一起输出
+const connectionStats = { new: 0, reused: 0 };
+
+/**
+ * 设置每个主机的最大并发连接数（重建连接池）
+ * @param {number} maxSockets
+ */
+function setMaxSockets(maxSockets) {
+  const cap = maxSockets || DEFAULT_MAX_SOCKETS;
+  if (cap === httpsAgent.maxSockets) return;
+  httpsAgent.destroy();
+  httpsAgent = new https.Agent({ keepAlive: true, maxSockets: cap });
+}
+
 function sleep(ms) {
   return new Promise(resolve => setTimeout(resolve, ms));
 }
@@ -64,6 +84,7 @@ function decompressBody(buffer, contentEncoding) {
 
 /**
  * 统一的网络请求工具（仅 https），带超时与重试，可处理 gzip/deflate/br 解压。
+ * 所有请求共用 keep-alive 连接池 httpsAgent。
  * @param {{
  *   url: string,
  *   method?: string,
@@ -93,9 +114,15 @@ async function request(options) {
           path: urlObj.pathname + urlObj.search,
           method,
           headers,
+          agent: httpsAgent,
         };
 
         const req = https.request(reqOptions, (res) => {
+          if (req.reusedSocket) {
+            connectionStats.reused++;
+          } else {
+            connectionStats.new++;
+          }
           const chunks = [];
           res.on('data', (chunk) => chunks.push(chunk));
           res.on('end', () => {
@@ -158,9 +185,47 @@ function extractCookies(headers) {
   return cookies.join('; ');
 }
 
+/**
+ * 解析 Set-Cookie 响应头，同时计算最早的过期时间
+ * @param {Object} headers - HTTP响应头
+ * @returns {{cookies: Object, expiresAt: number}} expiresAt 为 0 表示未声明过期时间
+ */
+function parseSetCookie(headers) {
+  const cookies = {};
+  let expiresAt = 0;
+  const now = Date.now();
+
+  (headers['set-cookie'] || []).forEach(line => {
+    const [pair, ...attrs] = line.split(';');
+    const eq = pair.indexOf('=');
+    if (eq <= 0) return;
+    const key = pair.slice(0, eq).trim();
+    const value = pair.slice(eq + 1).trim();
+    if (!key || !value) return;
+    cookies[key] = value;
+
+    let cookieExpiry = 0;
+    attrs.forEach(attr => {
+      const [name, ...rest] = attr.split('=');
+      const attrName = name.trim().toLowerCase();
+      const attrValue = rest.join('=').trim();
+      if (attrName === 'max-age') {
+        cookieExpiry = now + (parseInt(attrValue) || 0) * 1000;
+      } else if (attrName === 'expires' && !cookieExpiry) {
+        cookieExpiry = Date.parse(attrValue) || 0;
+      }
+    });
+    if (cookieExpiry && (!expiresAt || cookieExpiry < expiresAt)) {
+      expiresAt = cookieExpiry;
+    }
+  });
+
+  return { cookies, expiresAt };
+}
+
 /**
  * 从搜狗视频页面获取cookie
- * @returns {Promise<{cookieStr: string, cookieObj: Object}>} cookie字符串与对象
+ * @returns {Promise<{cookieStr: string, cookieObj: Object, expiresAt: number}>} cookie字符串、对象与过期时间
  */
 async function getSogouCookie() {
   try {
@@ -177,27 +242,131 @@ async function getSogouCookie() {
     });
 
     const cookies = extractCookies(resp.headers);
-    const cookieObj = {};
-    if (cookies) {
-      cookies.split('; ').forEach(cookie => {
-        const [key, value] = cookie.split('=');
-        if (key && value) {
-          cookieObj[key.trim()] = value.trim();
-        }
-      });
-    }
+    const { cookies: cookieObj, expiresAt } = parseSetCookie(resp.headers);
+
+    return { cookieStr: cookies || '', cookieObj, expiresAt };
+  } catch {
+    return { cookieStr: '', cookieObj: {}, expiresAt: 0 };
+  }
+}
+
+// ─── cookie 缓存 ──────────────────────────────────────────────────────────────
+// SNUID/SUID 在有效期内跨页面、跨账号复用；指定 --cookie-cache 时落盘，下次运行直接热启动。
+// 只有检测到反爬页面时才作废。
+
+const COOKIE_DEFAULT_TTL_MS = 60 * 60 * 1000;       // 未声明过期时间时按 1 小时
+const COOKIE_MAX_TTL_MS = 12 * 60 * 60 * 1000;      // 再长也最多复用 12 小时
+
+let cookieJar = null;          // { cookies: {name: value}, expiresAt: ms }
+let cookieJarPending = null;   // 正在获取中的 Promise，避免并发重复握手
+let cookieCachePath = '';
+
+function setCookieCachePath(filePath) {
+  cookieCachePath = filePath || '';
+}
+
+function cookieString(jar) {
+  return Object.entries(jar.cookies).map(([k, v]) => `${k}=${v}`).join('; ');
+}
+
+function writeFileAtomic(filePath, content) {
+  fs.mkdirSync(path.dirname(filePath), { recursive: true });
+  const tmp = `${filePath}.${process.pid}.tmp`;
+  fs.writeFileSync(tmp, content, 'utf-8');
+  fs.renameSync(tmp, filePath);
+}
 
-    return { cookieStr: cookies || '', cookieObj };
+function loadCookieJar() {
+  if (!cookieCachePath) return null;
+  try {
+    const jar = JSON.parse(fs.readFileSync(cookieCachePath, 'utf-8'));
+    if (jar && jar.cookies && jar.expiresAt > Date.now()) return jar;
   } catch {
-    return { cookieStr: '', cookieObj: {} };
+    // 缓存不存在或已损坏，重新获取
+  }
+  return null;
+}
+
+function saveCookieJar() {
+  if (!cookieCachePath || !cookieJar) return;
+  try {
+    writeFileAtomic(cookieCachePath, JSON.stringify(cookieJar));
+  } catch (error) {
+    console.error(`写入 cookie 缓存失败: ${error.message}`);
   }
 }
 
+function invalidateCookieJar() {
+  cookieJar = null;
+  if (!cookieCachePath) return;
+  try {
+    fs.unlinkSync(cookieCachePath);
+  } catch {
+    // 文件本就不存在
+  }
+}
+
+/**
+ * 把搜索响应里新下发的 cookie（如 SNUID）合并进当前 cookie jar
+ * @param {Object} headers - HTTP响应头
+ */
+function mergeCookies(headers) {
+  if (!cookieJar) return;
+  const { cookies } = parseSetCookie(headers);
+  if (Object.keys(cookies).length === 0) return;
+  cookieJar.cookies = { ...cookieJar.cookies, ...cookies };
+  saveCookieJar();
+}
+
+/**
+ * 返回有效的 cookie jar：优先内存，其次磁盘缓存，最后才向搜狗重新握手
+ * @returns {Promise<{cookies: Object, expiresAt: number}>}
+ */
+async function getCookieJar() {
+  const now = Date.now();
+  if (cookieJar && cookieJar.expiresAt > now) return cookieJar;
+
+  const cached = loadCookieJar();
+  if (cached) {
+    cookieJar = cached;
+    return cookieJar;
+  }
+
+  if (!cookieJarPending) {
+    cookieJarPending = (async () => {
+      const { cookieObj, expiresAt } = await getSogouCookie();
+      const fetchedAt = Date.now();
+      const ttl = expiresAt ? Math.min(expiresAt - fetchedAt, COOKIE_MAX_TTL_MS) : COOKIE_DEFAULT_TTL_MS;
+      const ok = Object.keys(cookieObj).length > 0;
+      // 握手失败时不缓存，下次请求重新获取
+      cookieJar = { cookies: cookieObj, expiresAt: ok ? fetchedAt + Math.max(ttl, 0) : 0 };
+      if (ok) {
+        saveCookieJar();
+      }
+      return cookieJar;
+    })().finally(() => {
+      cookieJarPending = null;
+    });
+  }
+  return cookieJarPending;
+}
+
+/**
+ * 判断响应是否为搜狗反爬验证页
+ * @param {{statusCode: number, headers: Object, text?: string}} resp
+ * @returns {boolean}
+ */
+function isAntispider(resp) {
+  const location = (resp.headers && resp.headers.location) || '';
+  if (location.includes('antispider')) return true;
+  return typeof resp.text === 'string' && /antispider|请输入验证码/.test(resp.text);
+}
+
 /**
  * 发起HTTP GET请求
  * @param {string} url - 请求URL
  * @param {string} cookieStr - cookie字符串（可选）
- * @returns {Promise<string>} 响应HTML内容
+ * @returns {Promise<{statusCode: number, headers: Object, text: string}>} 响应（含HTML文本）
  */
 async function httpGet(url, cookieStr = '') {
   const headers = {
@@ -208,14 +377,182 @@ async function httpGet(url, cookieStr = '') {
     headers['Cookie'] = cookieStr;
   }
 
-  const resp = await requestText({
+  return requestText({
     url,
     headers,
     timeoutMs: 30000,
     retries: 1,
   });
+}
+
+// ─── 自适应限速 ──────────────────────────────────────────────────────────────
+// 令牌桶控制本进程访问搜索页的速率：正常时按设定速率匀速请求（带抖动），
+// 遇到反爬页或 429 时速率减半并暂停一段指数退避时间，之后每次成功再逐步恢复。
+// 由 Python 调用时（--pace-stdin）改用 StdinPacer：令牌桶与退避状态在 Python 端全局共享，
+// 任何一个进程被限流，所有进程一起放慢。
 
-  return resp.text;
+const DEFAULT_RATE = 1;            // 每秒请求数
+const MIN_BACKOFF_MS = 5000;
+const MAX_BACKOFF_MS = 60000;
+
+class RateLimiter {
+  constructor(rate = DEFAULT_RATE) {
+    this.setRate(rate);
+  }
+
+  setRate(rate) {
+    this.maxRate = rate > 0 ? rate : DEFAULT_RATE;
+    this.rate = this.maxRate;
+    this.tokens = 1;
+    this.updatedAt = Date.now();
+    this.pausedUntil = 0;
+    this.backoffMs = MIN_BACKOFF_MS;
+  }
+
+  async acquire() {
+    for (;;) {
+      const now = Date.now();
+      if (now < this.pausedUntil) {
+        await sleep(this.pausedUntil - now);
+        continue;
+      }
+      // 桶容量为 1：不允许突发，只做匀速
+      this.tokens = Math.min(1, this.tokens + (now - this.updatedAt) / 1000 * this.rate);
+      this.updatedAt = now;
+      if (this.tokens >= 1) {
+        this.tokens -= 1;
+        return;
+      }
+      const waitMs = (1 - this.tokens) / this.rate * 1000;
+      await sleep(waitMs * (0.8 + Math.random() * 0.4));
+    }
+  }
+
+  /** 被限流/拦截：速率减半，暂停一段退避时间 */
+  penalize() {
+    this.rate = Math.max(this.maxRate / 16, this.rate / 2);
+    this.pausedUntil = Date.now() + this.backoffMs;
+    console.error(`限速：速率降至 ${this.rate.toFixed(2)}/s，暂停 ${this.backoffMs / 1000}s`);
+    this.backoffMs = Math.min(this.backoffMs * 2, MAX_BACKOFF_MS);
+  }
+
+  /** 请求成功：逐步恢复速率 */
+  reward() {
+    this.rate = Math.min(this.maxRate, this.rate + this.maxRate / 8);
+    this.backoffMs = MIN_BACKOFF_MS;
+  }
+}
+
+/**
+ * 由调用方统一限速：每次请求搜索页前输出 {"pace": "acquire"}，等 stdin 上的 {"pace": "go"} 放行；
+ * 请求后报告结果 {"pace": "ok"} / {"pace": "throttled"}（429 或反爬页）
+ */
+class StdinPacer {
+  async acquire() {
+    const grant = waitPaceGrant();
+    sendLine({ pace: 'acquire' });
+    if (!(await grant)) throw new Error('stdin 已关闭，无法取得限速令牌');
+  }
+
+  penalize() {
+    sendLine({ pace: 'throttled' });
+  }
+
+  reward() {
+    sendLine({ pace: 'ok' });
+  }
+}
+
+let limiter = new RateLimiter();
+
+// ─── stdin 行分发（worker / --pace-stdin 模式）────────────────────────────────
+// {"pace": "go"} 交给等待令牌的请求，其余行（worker 请求、已收录文章键）按顺序排队
+
+const stdinLines = [];
+const stdinWaiters = [];
+const paceWaiters = [];
+let stdinStarted = false;
+let stdinClosed = false;
+
+function startStdinReader() {
+  if (stdinStarted) return;
+  stdinStarted = true;
+  const readline = require('readline');
+  const rl = readline.createInterface({ input: process.stdin, crlfDelay: Infinity });
+  rl.on('line', (line) => {
+    if (!line.trim()) return;
+    let msg = null;
+    try {
+      msg = JSON.parse(line);
+    } catch (error) {
+      // 交给读取方报错
+    }
+    if (msg && msg.pace) {
+      const waiter = paceWaiters.shift();
+      if (waiter) waiter(true);
+      return;
+    }
+    const waiter = stdinWaiters.shift();
+    if (waiter) waiter(line);
+    else stdinLines.push(line);
+  });
+  rl.on('close', () => {
+    stdinClosed = true;
+    paceWaiters.splice(0).forEach(w => w(false));
+    stdinWaiters.splice(0).forEach(w => w(null));
+  });
+}
+
+/** 下一行 stdin 输入；stdin 关闭后返回 null */
+function nextStdinLine() {
+  startStdinReader();
+  if (stdinLines.length > 0) return Promise.resolve(stdinLines.shift());
+  if (stdinClosed) return Promise.resolve(null);
+  return new Promise(resolve => stdinWaiters.push(resolve));
+}
+
+/** 等待调用方放行下一次搜索页请求；stdin 关闭时返回 false */
+function waitPaceGrant() {
+  startStdinReader();
+  if (stdinClosed) return Promise.resolve(false);
+  return new Promise(resolve => paceWaiters.push(resolve));
+}
+
+/**
+ * 获取一页搜索结果 HTML（受全局限速约束）；遇到反爬页时作废 cookie 并重新握手重试一次，
+ * 遇到 429 时退避重试。两次都是 429 时抛 rateLimited 错误（只是限流，不算反爬拦截）
+ * @param {string} url - 搜索页URL
+ * @returns {Promise<string>} 响应HTML内容
+ */
+async function fetchSearchPage(url) {
+  let antispider = false;
+  for (let attempt = 0; attempt < 2; attempt++) {
+    await limiter.acquire();
+    const jar = await getCookieJar();
+    const resp = await httpGet(url, cookieString(jar));
+    if (resp.statusCode === 429) {
+      console.error('搜狗返回 429，退避后重试...');
+      limiter.penalize();
+      continue;
+    }
+    if (!isAntispider(resp)) {
+      limiter.reward();
+      mergeCookies(resp.headers);
+      return resp.text;
+    }
+    console.error('触发搜狗反爬验证，作废 cookie 后重试...');
+    antispider = true;
+    limiter.penalize();
+    invalidateCookieJar();
+  }
+  if (!antispider) {
+    const error = new Error('搜狗持续返回 429');
+    error.rateLimited = true;
+    throw error;
+  }
+  const error = new Error('触发搜狗反爬验证');
+  error.antispider = true;
+  throw error;
 }
 
 /**
@@ -316,6 +653,7 @@ function getRealUrl(url, cookieObj = {}, retries = 3) {
 
       for (let attempt = 0; attempt < retries; attempt++) {
         try {
+          await paceHost(url);
           const resp = await request({
             url,
             headers,
@@ -364,6 +702,16 @@ function parseCliArgs(args) {
   let num = 10;
   let output = '';
   let resolveRealUrl = false;
+  let worker = false;
+  let cookieCache = '';
+  let knownStdin = false;
+  let since = '';
+  let ndjson = false;
+  let resolveConcurrency = DEFAULT_RESOLVE_CONCURRENCY;
+  let maxSockets = DEFAULT_MAX_SOCKETS;
+  let urlCacheFile = '';
+  let rate = DEFAULT_RATE;
+  let paceStdin = false;
 
   for (let i = 0; i < args.length; i++) {
     if (args[i] === '-n' || args[i] === '--num') {
@@ -374,68 +722,211 @@ function parseCliArgs(args) {
       i++;
     } else if (args[i] === '-r' || args[i] === '--resolve-url') {
       resolveRealUrl = true;
+    } else if (args[i] === '--resolve-concurrency') {
+      resolveConcurrency = parseInt(args[i + 1]) || DEFAULT_RESOLVE_CONCURRENCY;
+      i++;
+    } else if (args[i] === '--rate') {
+      rate = parseFloat(args[i + 1]) || DEFAULT_RATE;
+      i++;
+    } else if (args[i] === '--url-cache') {
+      urlCacheFile = args[i + 1] || '';
+      i++;
+    } else if (args[i] === '--max-sockets') {
+      maxSockets = parseInt(args[i + 1]) || DEFAULT_MAX_SOCKETS;
+      i++;
+    } else if (args[i] === '--ndjson') {
+      ndjson = true;
+    } else if (args[i] === '--worker') {
+      worker = true;
+    } else if (args[i] === '--since') {
+      since = args[i + 1] || '';
+      i++;
+    } else if (args[i] === '--known-stdin') {
+      knownStdin = true;
+    } else if (args[i] === '--pace-stdin') {
+      paceStdin = true;
+    } else if (args[i] === '--cookie-cache') {
+      cookieCache = args[i + 1] || '';
+      i++;
     } else if (!args[i].startsWith('-')) {
       query = args[i];
     }
   }
 
-  return { query, num, output, resolveRealUrl };
+  return {
+    query, num, output, resolveRealUrl, resolveConcurrency, maxSockets, urlCacheFile, rate,
+    worker, cookieCache, knownStdin, since, ndjson, paceStdin,
+  };
+}
+
+// ─── 真实URL并发解析 ──────────────────────────────────────────────────────────
+
+const DEFAULT_RESOLVE_CONCURRENCY = 4;
+const HOST_MIN_GAP_MS = 200;     // 同一主机相邻两次请求的最小间隔
+const HOST_JITTER_MS = 300;      // 间隔上叠加的随机抖动
+
+const hostNextSlot = new Map();  // 主机 -> 下一次允许发请求的时间戳
+
+/**
+ * 按主机节流：为本次请求预约一个时间槽，同一主机的请求之间保持带抖动的最小间隔
+ * @param {string} url - 即将请求的URL
+ */
+async function paceHost(url) {
+  const host = new URL(url).hostname;
+  const now = Date.now();
+  const slot = Math.max(now, hostNextSlot.get(host) || 0);
+  hostNextSlot.set(host, slot + HOST_MIN_GAP_MS + Math.random() * HOST_JITTER_MS);
+  if (slot > now) {
+    await sleep(slot - now);
+  }
 }
 
 /**
- * 批量获取文章的真实URL
+ * 以不超过 limit 的并发度对 items 逐个执行 fn，结果顺序与输入一致
+ * @param {Array} items
+ * @param {number} limit
+ * @param {Function} fn - async (item, index) => result
+ * @returns {Promise<Array>}
+ */
+async function mapWithConcurrency(items, limit, fn) {
+  const results = new Array(items.length);
+  let next = 0;
+  const runners = Array.from({ length: Math.max(1, Math.min(limit, items.length)) }, async () => {
+    while (next < items.length) {
+      const i = next++;
+      results[i] = await fn(items[i], i);
+    }
+  });
+  await Promise.all(runners);
+  return results;
+}
+
+// ─── 真实URL缓存 ──────────────────────────────────────────────────────────────
+// 真实链接一旦解析出来就不会变：按「搜狗链接」和「规范化标题+来源」两种键落盘，
+// 与 Python 端 crawler.UrlCache 共用同一个文件。
+
+let urlCachePath = '';
+let urlCache = { links: {}, titles: {} };
+
+/**
+ * 规范化的 标题+来源 键（去空白、小写），与 Python 端 crawler.url_cache_key 一致
+ * @param {{title: string, source: string}} article
+ * @returns {string}
+ */
+function urlCacheKey(article) {
+  return `${(article.title || '').replace(/\s+/g, '').toLowerCase()}\t${(article.source || '').trim()}`;
+}
+
+function readUrlCacheFile() {
+  try {
+    const data = JSON.parse(fs.readFileSync(urlCachePath, 'utf-8'));
+    return { links: data.links || {}, titles: data.titles || {} };
+  } catch {
+    return { links: {}, titles: {} };
+  }
+}
+
+function setUrlCachePath(filePath) {
+  urlCachePath = filePath || '';
+  urlCache = urlCachePath ? readUrlCacheFile() : { links: {}, titles: {} };
+}
+
+function lookupUrlCache(article) {
+  return urlCache.links[article.url] || urlCache.titles[urlCacheKey(article)] || '';
+}
+
+/**
+ * 写回缓存：先合并磁盘上其它进程新写入的条目，再原子替换
+ * @param {Array} resolved - 本次新解析成功的文章
+ */
+function saveUrlCache(resolved) {
+  resolved.forEach(({ sogouUrl, article }) => {
+    urlCache.links[sogouUrl] = article.url;
+    urlCache.titles[urlCacheKey(article)] = article.url;
+  });
+  if (!urlCachePath || resolved.length === 0) return;
+  try {
+    const disk = readUrlCacheFile();
+    urlCache = {
+      links: { ...disk.links, ...urlCache.links },
+      titles: { ...disk.titles, ...urlCache.titles },
+    };
+    writeFileAtomic(urlCachePath, JSON.stringify(urlCache));
+  } catch (error) {
+    console.error(`写入URL缓存失败: ${error.message}`);
+  }
+}
+
+/**
+ * 批量获取文章的真实URL（有界并发，同一主机按带抖动的间隔节流）
  * @param {Array} articles - 文章列表
+ * @param {number} concurrency - 同时在途的解析请求数
  * @returns {Promise<Array>} 包含真实URL的文章列表
  */
-async function resolveRealUrls(articles) {
-  // 获取cookie用于解析URL
-  const { cookieObj } = await getSogouCookie();
-  
-  console.error(`获取到 ${articles.length} 篇文章，开始解析真实URL...`);
+async function resolveRealUrls(articles, concurrency = DEFAULT_RESOLVE_CONCURRENCY) {
+  // 先查缓存，只解析没见过的文章
+  const pending = [];
+  const results = articles.map((article, i) => {
+    const cached = lookupUrlCache(article);
+    if (cached) {
+      return { ...article, url: cached, url_resolved: true };
+    }
+    pending.push(i);
+    return null;
+  });
+  const cacheHits = articles.length - pending.length;
+  if (pending.length === 0) {
+    console.error(`${articles.length} 篇文章的真实URL均命中缓存`);
+    return results;
+  }
+
+  // 复用 cookie jar 解析URL
+  const { cookies: cookieObj } = await getCookieJar();
+
+  console.error(`获取到 ${articles.length} 篇文章（缓存命中 ${cacheHits}），开始解析其余 ${pending.length} 篇的真实URL（并发 ${concurrency}）...`);
   console.error('注意：搜狗微信有严格的反爬虫机制，可能无法获取真实URL');
-  
-  const results = [];
+
   let successCount = 0;
   let failCount = 0;
-  
-  for (let i = 0; i < articles.length; i++) {
-    const article = articles[i];
+  const newlyResolved = [];
+
+  const resolveOne = async (article, i) => {
     try {
-      console.error(`[${i + 1}/${articles.length}] 解析: ${article.title.substring(0, 30)}...`);
+      console.error(`[${i + 1}/${pending.length}] 解析: ${article.title.substring(0, 30)}...`);
       const realUrl = await getRealUrl(article.url, cookieObj);
-      
+
       // 检查是否成功获取到真实URL（不是搜狗链接，也不是antispider页面）
       const isSuccess = !realUrl.includes('weixin.sogou.com') && !realUrl.includes('antispider');
-      
-      results.push({
+      const result = {
         ...article,
         url: isSuccess ? realUrl : article.url,
         url_resolved: isSuccess
-      });
-      
+      };
       if (isSuccess) {
         successCount++;
+        newlyResolved.push({ sogouUrl: article.url, article: result });
       } else {
         failCount++;
       }
-      
-      // 添加延迟避免请求过快
-      if (i < articles.length - 1) {
-        await new Promise(resolve => setTimeout(resolve, 500 + Math.random() * 1000));
-      }
+      return result;
     } catch (error) {
       console.error(`  解析失败: ${error.message}`);
       failCount++;
-      results.push({
+      return {
         ...article,
         url: article.url,
         url_resolved: false
-      });
+      };
     }
-  }
-  
-  console.error(`\n解析完成: 成功 ${successCount}, 失败 ${failCount}`);
-  
+  };
+
+  await mapWithConcurrency(pending, concurrency, async (index, i) => {
+    results[index] = await resolveOne(articles[index], i);
+  });
+
+  saveUrlCache(newlyResolved);
+  console.error(`\n解析完成: 缓存命中 ${cacheHits}, 成功 ${successCount}, 失败 ${failCount}`);
+
   return results;
 }
 
@@ -612,13 +1103,40 @@ function parseArticle($, element) {
   }
 }
 
+/**
+ * 文章唯一键：标题 + 来源（与 Python 端 store.article_key 保持一致）
+ * @param {{title: string, source: string}} article
+ * @returns {string}
+ */
+function articleKey(article) {
+  return `${(article.title || '').trim()}\t${(article.source || '').trim()}`;
+}
+
 /**
  * 搜索微信公众号文章
  * @param {string} query - 搜索关键词
  * @param {number} maxResults - 最大返回结果数（默认10，最大50）
+ * @param {boolean} resolveRealUrl - 是否解析真实URL
+ * @param {{
+ *   known?: Set<string>, since?: string, resolveConcurrency?: number,
+ *   onArticles?: Function, onBlocked?: Function
+ * }} options
+ *   known: 已收录文章的唯一键，整页都已收录时停止翻页
+ *   since: 截止日期（YYYY-MM-DD），某页最旧的文章早于它时停止翻页
+ *   resolveConcurrency: 解析真实URL时同时在途的请求数
+ *   onArticles: 每解析（并按需解析真实URL）完一页就回调一次，用于流式输出
+ *   onBlocked: 重试后仍被搜狗反爬拦截时回调
+ *   onRateLimited: 重试后仍被限流（429）时回调
  * @returns {Promise<Array>} 文章列表
  */
-async function searchWechatArticles(query, maxResults = 10, resolveRealUrl = false) {
+async function searchWechatArticles(query, maxResults = 10, resolveRealUrl = false, options = {}) {
+  const known = options.known || new Set();
+  const since = options.since || '';
+  const resolveConcurrency = options.resolveConcurrency || DEFAULT_RESOLVE_CONCURRENCY;
+  const onArticles = options.onArticles || (() => {});
+  const onBlocked = options.onBlocked || (() => {});
+  const onRateLimited = options.onRateLimited || (() => {});
+
   // 限制最大结果数
   maxResults = Math.min(maxResults, 50);
 
@@ -628,41 +1146,110 @@ async function searchWechatArticles(query, maxResults = 10, resolveRealUrl = fal
 
   while (articles.length < maxResults && page <= pagesNeeded) {
     try {
-      // 先获取cookie
-      const { cookieStr } = await getSogouCookie();
-      
       // 构建搜索URL
       const encodedQuery = encodeURIComponent(query);
       const url = `https://weixin.sogou.com/weixin?query=${encodedQuery}&s_from=input&_sug_=n&type=2&page=${page}&ie=utf8`;
 
-      const html = await httpGet(url, cookieStr);
+      const html = await fetchSearchPage(url);
 
       const remaining = maxResults - articles.length;
-      const parsed = parseArticlesFromSearchHtml(html, remaining);
+      let parsed = parseArticlesFromSearchHtml(html, remaining);
       if (parsed.length === 0) break;
+
+      // 逐页解析真实URL，解析完即可输出，不必等所有页
+      if (resolveRealUrl) {
+        console.error(`正在解析第${page}页的真实URL...`);
+        parsed = await resolveRealUrls(parsed, resolveConcurrency);
+      }
       articles.push(...parsed);
+      onArticles(parsed);
 
-      page++;
+      // 增量模式：整页都是已收录的文章，后面的页只会更旧
+      if (known.size > 0 && parsed.every(a => known.has(articleKey(a)))) {
+        console.error(`第${page}页均为已收录文章，停止翻页`);
+        break;
+      }
 
-      // 添加短暂延迟避免请求过快
-      if (page <= pagesNeeded) {
-        await new Promise(resolve => setTimeout(resolve, 500 + Math.random() * 1000));
+      // 结果大致按时间倒序：本页最旧的文章已早于截止日期，后面的页不会再有需要的文章
+      if (since) {
+        const dated = parsed.map(a => a.datetime).filter(Boolean).sort();
+        if (dated.length > 0 && dated[0].slice(0, 10) < since) {
+          console.error(`第${page}页已早于 ${since}，停止翻页`);
+          break;
+        }
       }
+
+      // 翻页间隔由 fetchSearchPage 里的全局限速控制
+      page++;
     } catch (error) {
       console.error(`请求第${page}页失败:`, error.message);
+      if (error.antispider) {
+        onBlocked();
+      } else if (error.rateLimited) {
+        onRateLimited();
+      }
       break;
     }
   }
 
-  const result = articles.slice(0, maxResults);
-  
-  // 如果需要解析真实URL
-  if (resolveRealUrl && result.length > 0) {
-    console.error('正在解析真实URL...');
-    return await resolveRealUrls(result);
-  }
+  return articles.slice(0, maxResults);
+}
 
-  return result;
+/**
+ * 向 stdout 写出一行 JSON（NDJSON 协议）
+ * @param {Object} obj
+ */
+function sendLine(obj) {
+  process.stdout.write(JSON.stringify(obj) + '\n');
+}
+
+/**
+ * 常驻 worker 模式：从 stdin 逐行读取 JSON 请求，向 stdout 逐行流式写出结果。
+ * 请求：{"id": 1, "query": "...", "num": 30, "resolve": false, "resolve_concurrency": 4,
+ *        "since": "2026-01-01", "known": ["标题\t来源", ...]}
+ * 响应：每篇文章一行 {"id": 1, "article": {...}}，
+ *       最后一行 {"id": 1, "done": true, "total": n, "blocked": false, "rate_limited": false,
+ *                 "connections": {"new": x, "reused": y}}
+ *       （blocked 表示被搜狗反爬拦截，rate_limited 表示持续 429）；
+ *       出错时为 {"id": 1, "error": "..."}
+ * 请求按到达顺序串行处理；日志仍写到 stderr。stdin 关闭后进程退出。
+ * 带 --pace-stdin 时搜索中还会输出限速消息（见 StdinPacer），与请求共用 stdin / stdout。
+ */
+async function runWorker() {
+  sendLine({ ready: true });
+  for (;;) {
+    const line = await nextStdinLine();
+    if (line === null) break;
+
+    let req;
+    try {
+      req = JSON.parse(line);
+    } catch (error) {
+      sendLine({ error: `无效请求: ${error.message}` });
+      continue;
+    }
+
+    try {
+      console.error(`[worker] 正在搜索: "${req.query}"...`);
+      let blocked = false;
+      let rateLimited = false;
+      const articles = await searchWechatArticles(req.query, req.num || 10, !!req.resolve, {
+        known: new Set(req.known || []),
+        since: req.since || '',
+        resolveConcurrency: req.resolve_concurrency,
+        onArticles: (batch) => batch.forEach(article => sendLine({ id: req.id, article })),
+        onBlocked: () => { blocked = true; },
+        onRateLimited: () => { rateLimited = true; },
+      });
+      sendLine({
+        id: req.id, done: true, total: articles.length, blocked, rate_limited: rateLimited,
+        connections: connectionStats,
+      });
+    } catch (error) {
+      sendLine({ id: req.id, error: error.message });
+    }
+  }
+  process.exit(0);
 }
 
 /**
@@ -671,7 +1258,23 @@ async function searchWechatArticles(query, maxResults = 10, resolveRealUrl = fal
 async function main() {
   const args = process.argv.slice(2);
 
-  const { query, num, output, resolveRealUrl } = parseCliArgs(args);
+  const {
+    query, num, output, resolveRealUrl, resolveConcurrency, maxSockets, urlCacheFile, rate,
+    worker, cookieCache, knownStdin, since, ndjson, paceStdin,
+  } = parseCliArgs(args);
+  if (paceStdin) {
+    limiter = new StdinPacer();
+  } else {
+    limiter.setRate(rate);
+  }
+  setCookieCachePath(cookieCache);
+  setUrlCachePath(urlCacheFile);
+  setMaxSockets(maxSockets);
+
+  if (worker) {
+    await runWorker();
+    return;
+  }
   
   if (!query) {
     console.log(`
@@ -684,11 +1287,23 @@ async function main() {
   -n, --num <数量>       返回结果数量（默认10，最大50）
   -o, --output <文件>    输出JSON文件路径
   -r, --resolve-url      解析真实的微信文章URL（会额外请求每个链接）
+  --resolve-concurrency <数量>  解析真实URL的并发数（默认4）
+  --url-cache <文件>     真实URL缓存文件（已解析过的链接不再请求）
+  --since <YYYY-MM-DD>   截止日期，某页最旧的文章早于它时停止翻页
+  --known-stdin          从 stdin 读取已收录文章键（JSON 数组），整页已收录时停止翻页
+  --rate <次/秒>         搜索页请求速率上限（默认1，被限流时自动退避）
+  --pace-stdin           由调用方统一限速：请求搜索页前输出 {"pace":"acquire"}，等 stdin 上的
+                         {"pace":"go"} 再发出（--known-stdin 此时只读第一行）
+  --max-sockets <数量>   每个主机的最大 keep-alive 连接数（默认8）
+  --cookie-cache <文件>  搜狗 cookie 缓存文件（有效期内跨运行复用）
+  --ndjson               流式输出：每解析完一页即逐行输出文章 JSON，最后一行为 {"done": true}
+  --worker               常驻模式：从 stdin 逐行读取 JSON 请求，逐行流式输出结果
 
 示例:
   node search_wechat.js "人工智能" -n 20
   node search_wechat.js "ChatGPT" -n 10 -o result.json
   node search_wechat.js "人工智能" -n 5 -r
+  node search_wechat.js "机器之心" -n 50 --since 2026-01-01
 `);
     process.exit(0);
   }
@@ -696,25 +1311,66 @@ async function main() {
   try {
     console.error(`正在搜索: "${query}"...`);
     
-    const articles = await searchWechatArticles(query, num, resolveRealUrl);
+    let known = new Set();
+    if (knownStdin) {
+      // --pace-stdin 时 stdin 还要接收限速放行，已收录文章键只占第一行
+      const text = paceStdin ? await nextStdinLine() : fs.readFileSync(0, 'utf-8');
+      known = new Set(JSON.parse(text || '[]'));
+    }
+
+    let blocked = false;
+    let rateLimited = false;
+    const onBlocked = () => { blocked = true; };
+    const onRateLimited = () => { rateLimited = true; };
+
+    if (ndjson) {
+      const articles = await searchWechatArticles(query, num, resolveRealUrl, {
+        known,
+        since,
+        resolveConcurrency,
+        onArticles: (batch) => batch.forEach(article => sendLine({ article })),
+        onBlocked,
+        onRateLimited,
+      });
+      sendLine({
+        done: true, total: articles.length, blocked, rate_limited: rateLimited,
+        connections: connectionStats,
+      });
+      if (paceStdin) process.exit(0);  // stdin 仍打开，不会自行退出
+      return;
+    }
+
+    const articles = await searchWechatArticles(query, num, resolveRealUrl, {
+      known,
+      since,
+      resolveConcurrency,
+      onBlocked,
+      onRateLimited,
+    });
     
     const result = {
       query,
       total: articles.length,
+      blocked,
+      rate_limited: rateLimited,
+      connections: connectionStats,
       articles
     };
     
     const jsonOutput = JSON.stringify(result, null, 2);
     
     if (output) {
-      const fs = require('fs');
       fs.writeFileSync(output, jsonOutput, 'utf-8');
       console.error(`结果已保存到: ${output}`);
     }
     
     console.log(jsonOutput);
+    if (paceStdin) process.exit(0);
   } catch (error) {
     console.error('搜索失败:', error.message);
+    if (ndjson) {
+      sendLine({ error: error.message });
+    }
     process.exit(1);
   }
 }